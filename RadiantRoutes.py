@@ -21,13 +21,13 @@ __status__ = "alpha"
 # Default Packages
 import argparse
 import os
-import pandas as pd
 import sys
 
 # Packages Imported by RRvenv
+#NOTE pandas, numpy, and psutil are imported in main only where a stage
+#needs them, so --help, --plan, and argument errors start fast.
 
 # Local Packages
-from src.procSMARTS import procSMARTS
 # WTH custom logging class added in another file called "fancylog.py"
 from src.fancylog import FancyLog
 
@@ -48,7 +48,10 @@ DFHD = {\
     "dfagl": ["Agl", "agl", "AGL"], \
     "dft": ["column_temperature"], \
     "dfrh": ["column_relhum"], \
+    "dftrack": ["Track", "track", "TRACK", "track_id", "Individual", "individual", "bird_id", "flight_id"], \
     }
+# Headers which are only needed by optional stages
+DFOPT = ["dftrack"]
 
 def in_venv(log=None):
     """
@@ -98,17 +101,22 @@ def check_import(checkme, log=None):
 
         return
 
-def arg_parsing():
+def arg_parsing(argv=None):
     """
     | Container for command line arguments
 
+    Parameters
+    ----------
+    argv : list
+        arguments to parse.  Default=sys.argv
+
     Returns
     -------
     args : argparse object
     """
     # argument parser
     parser = argparse.ArgumentParser(prog=os.path.basename(__file__), \
-        description='Automated solar irradiance for birds in flight', \
+        description='Automated solar irradiance for birds in flight.  Use "plot" as the first argument to plot an earlier run, same as -s/--skip', \
         epilog='', \
     )
     ## Input file
@@ -123,6 +131,97 @@ def arg_parsing():
         default="BIRDIRR", \
         help="String identifier for this run, 8 char max!", \
     )
+    ## Group rows sharing time and location into vertical profiles
+    parser.add_argument("-P", "--profile", \
+        action="store_true", \
+        required=False, \
+        help="Profile mode for radar columns, rows with the same time, lat, and lon share geometry and decks", \
+    )
+    ## Save the per-profile array; requires --profile
+    parser.add_argument("--profile-array", \
+        action="store_true", \
+        required=False, \
+        help="Also save a per-profile array of results to SMARTS_profile.csv", \
+    )
+    ## Spectral bands to integrate from the saved spectra
+    parser.add_argument("-b", "--bands", \
+        default=None, \
+        required=False, \
+        help="Comma separated bands to integrate from the spectra, built-in [UVB,UVA,PAR,PPFD,UVERY] or NAME:WLMIN:WLMAX[:WEIGHT]", \
+    )
+    ## Column of the .ext.txt spectra used for the bands
+    parser.add_argument("--spectra-column", \
+        default=None, \
+        required=False, \
+        help="Header of the spectral column to integrate.  Default=first Global column", \
+    )
+    ## Per-track cumulative dose
+    parser.add_argument("-d", "--dose", \
+        action="store_true", \
+        required=False, \
+        help="Integrate irradiance over time for each track id, saved to SMARTS_dose.csv", \
+    )
+    ## Longest interval integrated for the dose
+    parser.add_argument("--maxgap", \
+        default=None, \
+        required=False, \
+        type=float, \
+        help="Longest interval in seconds between fixes counted in the dose.  Default=no limit", \
+    )
+    ## How failed SMARTS rows are treated in the dose
+    parser.add_argument("--dose-fail", \
+        default="gap", \
+        required=False, \
+        choices=["gap", "interp"], \
+        help="Failed rows either leave a gap in the dose or are interpolated within the track", \
+    )
+    ## Concurrent SMARTS workers managed by the governor
+    parser.add_argument("-j", "--workers", \
+        default=1, \
+        required=False, \
+        type=arg_count, \
+        help="Max concurrent SMARTS workers, scaled by the governor.  0=cpu count, Default=1 (serial)", \
+    )
+    ## Free disk space needed to keep running
+    parser.add_argument("--minfree", \
+        default=1024, \
+        required=False, \
+        type=float, \
+        help="MB of free space on the data volume under which SMARTS runs pause.  Default=1024", \
+    )
+    ## Ensemble members for the uncertain deck inputs
+    parser.add_argument("-E", "--members", \
+        default=0, \
+        required=False, \
+        type=int, \
+        help="Run an ensemble of this many members over the perturbed cards.  Default=0 (off)", \
+    )
+    ## Perturbations used by the ensemble
+    parser.add_argument("--perturb", \
+        default="tau550=lognormal:0.2:1.5,rhox=uniform:0.15:0.35,tday=normal:25:5,qco2=normal:427:3", \
+        required=False, \
+        help="Comma separated CARD=DIST:PARAMS for the ensemble, cards [tau550,rhox,tday,qco2], dists [normal,uniform,lognormal,triangular]", \
+    )
+    ## Percentiles reported by the ensemble
+    parser.add_argument("--percentiles", \
+        default="5,50,95", \
+        required=False, \
+        type=lambda xxx: [float(val) for val in xxx.split(',')], \
+        help="Comma separated percentiles reported by the ensemble.  Default=5,50,95", \
+    )
+    ## Seed for the ensemble draws
+    parser.add_argument("--seed", \
+        default=None, \
+        required=False, \
+        type=int, \
+        help="Random seed for the ensemble draws", \
+    )
+    ## Dry run
+    parser.add_argument("--plan", \
+        action="store_true", \
+        required=False, \
+        help="Report headers, row count, nighttime skips, and SMARTS invocations without running", \
+    )
     # ## Input directory path; requires DEF-dir_path and os
     # parser.add_argument("inpath", type=arg_dir_path,\
     #     help="Path to *directory* files")
@@ -136,12 +235,18 @@ def arg_parsing():
     # parser.add_argument("indate",\
     #     type=lambda xxx: datetime.strptime(xxx, "%Y-%m-%d"),\
     #         help="Input date with format YYYY-MM-DD")
-    # ## Flag to plot data
-    # parser.add_argument("-p", "--plot", action="store_true", required=False,\
-    #     help="Plot output data")
-    # ## Flag to skip to code position
-    # parser.add_argument("-s", "--skip", action="store_true", required=False,\
-    #     help="Skip processing and plot only")
+    ## Flag to plot data
+    parser.add_argument("-p", "--plot", action="store_true", required=False,\
+        help="Plot output data")
+    ## Flag to skip to code position
+    parser.add_argument("-s", "--skip", action="store_true", required=False,\
+        help="Skip processing and plot only, same as the plot subcommand")
+    ## Column of the output to plot
+    parser.add_argument("--plot-column", \
+        default="SMARTSirr", \
+        required=False, \
+        help="Column of SMARTS_irr.csv to plot.  Default=SMARTSirr", \
+    )
     ## Flag for verbose logging; requires logging
     parser.add_argument("-v", "--verbose", default="warning", required=False,\
         help="Provide logging level. Options: [debug,info,warning,error,critical]" )
@@ -154,7 +259,7 @@ def arg_parsing():
     )
 
     # Parse everything we have and output
-    args = parser.parse_args()
+    args = parser.parse_args(argv)
     return args
 
 def arg_capstr(instr):
@@ -213,6 +318,27 @@ def arg_file_path(path):
         raise argparse.ArgumentTypeError(f"readable_file:{path} is not a valid to a file")
     return os.path.abspath(path)
 
+def arg_count(val):
+    """
+    | Check that the value is a whole number, 0 or more.  Else raises an error.
+
+    Parameters
+    ----------
+    val : string
+        stringlike number to check
+
+    Returns
+    -------
+    count : int
+    """
+    try:
+        count = int(val)
+    except ValueError:
+        raise argparse.ArgumentTypeError(f"{val} is not a whole number")
+    if count < 0:
+        raise argparse.ArgumentTypeError(f"{val} must be 0 or more")
+    return count
+
 def df_checker(indf, log=None):
     """
     | Check that the dataframe has all of the required info in the headers
@@ -232,6 +358,8 @@ def df_checker(indf, log=None):
             if log: log.warning(f"DF header has more than one match for {matches}")
         elif len(matches) > 0:
             if log: log.debug(f"DF header match for {matches}")
+        elif key in DFOPT:
+            if log: log.info(f"Optional DF header not found from valid options in {DFHD[key]}")
         else:
             if log: log.error(f"DF header match not found from valid options in {DFHD[key]}, please check your input csv")
     return
@@ -246,12 +374,30 @@ def df_checker(indf, log=None):
 
 
 
+def plot_output(args, log=None):
+    """
+    | Plot the output of a run from SMARTS_irr.csv and SMARTS_dose.csv
+
+    Parameters
+    ----------
+    args : argparse object
+    log : Logging Object
+        Logging object to print messages to a logfile
+    """
+    from src.procPlot import procPlot
+    procplot = procPlot(args.infile, DFHD, PWD, column=args.plot_column, log=log)
+    procplot.run()
+    return
+
 def main():
     '''
     | Main is where the magic happens
     '''
-    # Parse args
-    args = arg_parsing()
+    # Parse args, "plot" as the first argument is the plot-only subcommand
+    argv = sys.argv[1:]
+    if argv and argv[0] == "plot":
+        argv = argv[1:] + ["--skip"]
+    args = arg_parsing(argv)
 
     # create console handler with a higher log level
     logger = FancyLog(makelog=True, loglvl=args.verbose.upper(), logpath=PWD + "/logs").run()
@@ -260,15 +406,69 @@ def main():
     # Ensure the correct venv is loaded
     in_venv(log=logger)
 
+    # Report the plan without loading the execution stack
+    if args.plan:
+        from src.plan import procPlan
+        procplan = procPlan(args.infile, DFHD, DFOPT, args.runid, PWD, \
+            profile=args.profile, members=args.members, log=logger)
+        procplan.run()
+        procplan.print_report()
+        return
+
+    # Plot an earlier run without processing
+    if args.skip:
+        plot_output(args, log=logger)
+        return
+
     # Import the dataframe containing bird tracks
+    import pandas as pd
+    from src.procSMARTS import procSMARTS
     indf = pd.read_csv(args.infile)
     # Confirm that the file has all of the info we need
     df_checker(indf, log=logger)
 
+    # Resource governor for the SMARTS workers, serial runs still pause
+    # before the disk fills
+    from src.governor import Governor
+    governor = Governor(PWD + "/data", maxworkers=args.workers, minfree=args.minfree, log=logger)
+
     # Load the SMARTS processor and create files
-    procsmarts = procSMARTS(indf, args.runid, DFHD, PWD, log=logger)
-    procsmarts.create_inps()
-    procsmarts.run_smarts()
+    procsmarts = procSMARTS(indf, args.runid, DFHD, PWD, profile=args.profile, governor=governor, log=logger)
+    if args.members > 0:
+        # Ensemble members are reduced per block, their files aren't kept
+        if args.profile or args.bands:
+            logger.warning("Profile mode and spectral bands are not used by ensembles")
+        from src.ensemble import procEnsemble
+        procensemble = procEnsemble(procsmarts, args.perturb, members=args.members, \
+            percentiles=args.percentiles, seed=args.seed, log=logger)
+        procensemble.run()
+    else:
+        procsmarts.create_inps()
+        procsmarts.run_smarts()
+    if args.profile_array and args.members == 0:
+        procsmarts.save_profiles()
+
+    # Integrate spectral bands and add them to the output
+    if args.bands and args.members == 0:
+        from src.procSpectra import procSpectra
+        procspectra = procSpectra(PWD, bands=args.bands, column=args.spectra_column, log=logger)
+        procsmarts.extra = procspectra.integrate(procsmarts.row_fileids(), codes=procsmarts.outarray)
+        procsmarts.save_output()
+
+    # Aggregate the dose for each track
+    if args.dose:
+        from src.procDose import procDose
+        # The dose of an ensemble is the dose of the mean
+        irrdf = procsmarts.output_frame()
+        if args.members > 0:
+            irrdf = irrdf[["SMARTSirr"]]
+        procdose = procDose(indf, irrdf, DFHD, PWD, \
+            maxgap=args.maxgap, fail=args.dose_fail, log=logger)
+        if procdose.aggregate() is not None:
+            procdose.save_output()
+
+    if args.plot:
+        plot_output(args, log=logger)
 
     return
 
@@ -0,0 +1,97 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+Check of the ensemble reducer against numpy on random members
+"""
+
+# Backwards Comaptibility
+from __future__ import print_function
+
+# dunders
+__author__ = "Wesley T. Honeycutt"
+__copyright__ = "Copyright 2025"
+__credits__ = ["Wesley T. Honeycutt"]
+__license__ = "GPL-3.0"
+__version__ = "0.1.0"
+__maintainer__ = "Wesley T. Honeycutt"
+__email__ = "honeycutt@ou.edu"
+__status__ = "alpha"
+
+# Default Packages
+import argparse
+import os
+import sys
+import warnings
+
+# Root of the repository, one level up from bench/
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+import numpy as np
+
+from src.ensemble import BlockStats
+
+def reduce(vals, block, percentiles):
+    """
+    | Feed blocks of rows to BlockStats the way procEnsemble.run does.
+
+    Parameters
+    ----------
+    vals : numpy array
+        (rows x members) values, NaN for failed members
+    block : int
+        rows per block
+    percentiles : list
+        percentiles to report, 0 to 100
+
+    Returns
+    -------
+    stats : BlockStats
+    """
+    stats = BlockStats(len(vals), percentiles)
+    for start in range(0, len(vals), block):
+        stats.update(start, vals[start:start + block])
+    return stats
+
+def main():
+    '''
+    | Compare mean, std, and percentiles with np.nanmean, np.nanstd, and
+    | np.nanpercentile.  Exits 1 on any mismatch.
+    '''
+    parser = argparse.ArgumentParser(description="Check the ensemble reducer against numpy")
+    parser.add_argument("-r", "--rows", default=1000, type=int, help="Rows per check.  Default=1000")
+    parser.add_argument("-b", "--block", default=256, type=int, help="Rows per block.  Default=256")
+    parser.add_argument("-s", "--seed", default=0, type=int, help="Random seed.  Default=0")
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(args.seed)
+    percentiles = [5, 50, 95]
+    failed = False
+    for members in [1, 2, 5, 8, 20]:
+        vals = rng.lognormal(6, 0.5, (args.rows, members))
+        vals[rng.random(vals.shape) < 0.1] = np.nan
+        vals[:5] = np.nan
+        stats = reduce(vals, args.block, percentiles)
+        count = np.isfinite(vals).sum(axis=1)
+        # All-NaN rows warn in numpy, they are expected here
+        with warnings.catch_warnings():
+            warnings.simplefilter("ignore", RuntimeWarning)
+            mean = np.nanmean(vals, axis=1)
+            std = np.where(count > 1, np.nanstd(vals, axis=1, ddof=1), np.nan)
+            pcts = np.nanpercentile(vals, percentiles, axis=1).T
+        errs = {\
+            "count": not np.array_equal(stats.count, count), \
+            "mean": not np.allclose(stats.mean, mean, equal_nan=True), \
+            "std": not np.allclose(stats.std, std, equal_nan=True), \
+            "pcts": not np.allclose(stats.pcts, pcts, equal_nan=True), \
+        }
+        bad = [key for key, err in errs.items() if err]
+        failed |= bool(bad)
+        print(f"{members:3d} members  {'FAIL ' + ','.join(bad) if bad else 'ok'}")
+    sys.exit(1 if failed else 0)
+    return
+
+
+if __name__ == "__main__":
+    main()
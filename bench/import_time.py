@@ -0,0 +1,127 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+Import-time benchmark for the RadiantRoutes CLI fast paths
+"""
+
+# Backwards Comaptibility
+from __future__ import print_function
+
+# dunders
+__author__ = "Wesley T. Honeycutt"
+__copyright__ = "Copyright 2025"
+__credits__ = ["Wesley T. Honeycutt"]
+__license__ = "GPL-3.0"
+__version__ = "0.1.0"
+__maintainer__ = "Wesley T. Honeycutt"
+__email__ = "honeycutt@ou.edu"
+__status__ = "alpha"
+
+# Default Packages
+import argparse
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+# Root of the repository, one level up from bench/
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+# Modules which must not load on the fast paths
+HEAVY = ["numpy", "pandas", "xarray", "psutil", "matplotlib"]
+# Runs a CLI path in-process and prints the heavy modules it loaded
+PROBE = """
+import contextlib, io, runpy, sys
+sys.argv = {argv!r}
+with contextlib.redirect_stdout(io.StringIO()), contextlib.redirect_stderr(io.StringIO()):
+    try:
+        runpy.run_path("RadiantRoutes.py", run_name="__main__")
+    except SystemExit:
+        pass
+print(",".join(mod for mod in {heavy!r} if mod in sys.modules))
+"""
+
+def write_csv(path, nrows):
+    """
+    | Write a small synthetic track csv for the --plan path.
+
+    Parameters
+    ----------
+    path : string
+        output csv path
+    nrows : int
+        number of rows
+    """
+    with open(path, 'w') as outfile:
+        outfile.write("Year,Month,Day,Hour,Minute,Second,Latitude,Longitude,Season,ASL,AGL,column_temperature,column_relhum\n")
+        for idx in range(nrows):
+            outfile.write(f"2024,5,10,{idx % 24},0,0,35.2,-97.4,spring,{500 + idx % 10},{100 + idx % 10},20,50\n")
+    return
+
+def time_path(argv, repeat):
+    """
+    | Time a CLI path in fresh interpreters and list the heavy modules it loads.
+
+    Parameters
+    ----------
+    argv : list
+        arguments after RadiantRoutes.py
+    repeat : int
+        number of timed runs
+
+    Returns
+    -------
+    median : float
+        median wall time in seconds
+    heavy : list
+        heavy modules loaded by the path
+    """
+    times = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        subprocess.run([sys.executable, "RadiantRoutes.py"] + argv, cwd=ROOT, \
+            stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+        times.append(time.perf_counter() - start)
+    probe = subprocess.run([sys.executable, "-c", PROBE.format(argv=["RadiantRoutes.py"] + argv, heavy=HEAVY)], \
+        cwd=ROOT, capture_output=True, text=True)
+    heavy = [mod for mod in probe.stdout.strip().split(',') if mod]
+    return statistics.median(times), heavy
+
+def main():
+    '''
+    | Time --help, an argument error, and --plan.  Exits 1 if a fast path loads
+    | a heavy module or runs over budget.
+    '''
+    parser = argparse.ArgumentParser(description="Import-time benchmark for RadiantRoutes")
+    parser.add_argument("-n", "--repeat", default=5, type=int, help="Timed runs per path.  Default=5")
+    parser.add_argument("-b", "--budget", default=0.5, type=float, \
+        help="Max median seconds for each path.  Default=0.5")
+    args = parser.parse_args()
+
+    failed = False
+    with tempfile.TemporaryDirectory() as tmpdir:
+        csvpath = tmpdir + "/plan.csv"
+        write_csv(csvpath, 1000)
+        paths = {\
+            "--help": ["--help"], \
+            "bad args": ["/no/such/file.csv"], \
+            "--plan": [csvpath, "--plan"], \
+        }
+        for name, argv in paths.items():
+            median, heavy = time_path(argv, args.repeat)
+            status = "ok"
+            if heavy:
+                status = "FAIL loaded " + ",".join(heavy)
+                failed = True
+            elif median > args.budget:
+                status = "FAIL over budget"
+                failed = True
+            print(f"{name:10s} {median * 1000:8.1f} ms  {status}")
+    sys.exit(1 if failed else 0)
+    return
+
+
+if __name__ == "__main__":
+    main()
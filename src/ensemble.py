@@ -0,0 +1,294 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+Ensemble runs of SMARTS for the uncertain deck inputs
+"""
+
+# Backwards Comaptibility
+from __future__ import print_function
+
+# dunders
+__author__ = "Wesley T. Honeycutt"
+__copyright__ = "Copyright 2025"
+__credits__ = ["Wesley T. Honeycutt"]
+__license__ = "GPL-3.0"
+__version__ = "0.1.0"
+__maintainer__ = "Wesley T. Honeycutt"
+__email__ = "honeycutt@ou.edu"
+__status__ = "alpha"
+
+import numpy as np
+import os
+import pandas as pd
+
+from src.solarpos import is_night, missing
+
+
+class BlockStats:
+    """
+    | Ensemble statistics for many rows at once.  The member values of one
+    | block of rows are held as a (rows x members) array and reduced together
+    | with nanmean, nanstd, and nanpercentile, so only one block is ever held.
+    """
+
+    def __init__(self, nrows, percentiles=(5, 50, 95)):
+        """
+        | Initializes the reducer
+
+        Parameters
+        ----------
+        nrows : int
+            number of rows reduced
+        percentiles : list
+            percentiles to report, 0 to 100
+        """
+        self.pct = np.asarray(percentiles, dtype=float)
+        self.count = np.zeros(nrows, dtype=int)
+        self.mean = np.full(nrows, np.nan)
+        self.std = np.full(nrows, np.nan)
+        self.pcts = np.full((nrows, len(self.pct)), np.nan)
+        return
+
+    def update(self, start, block):
+        """
+        | Reduce a block of consecutive rows.
+
+        Parameters
+        ----------
+        start : int
+            first row of the block
+        block : numpy array
+            (rows x members) values, NaN for members which failed
+        """
+        count = np.isfinite(block).sum(axis=1)
+        self.count[start:start + len(block)] = count
+        # All-NaN rows would warn, they keep NaN instead
+        found = np.flatnonzero(count > 0)
+        if len(found) == 0:
+            return
+        vals = block[found]
+        self.mean[start + found] = np.nanmean(vals, axis=1)
+        multi = count[found] > 1
+        self.std[start + found[multi]] = np.nanstd(vals[multi], axis=1, ddof=1)
+        self.pcts[start + found] = np.nanpercentile(vals, self.pct, axis=1).T
+        return
+
+
+class procEnsemble:
+    """
+    Run SMARTS ensembles over perturbed deck inputs and reduce them per row
+    """
+    procsmarts = None
+    log = None
+    members = 20
+    block = 256
+    # Decimals kept for each perturbed card, so close draws share a deck
+    CARD_ROUND = {\
+        "tday":1, \
+        "qco2":0, \
+        "tau550":3, \
+        "rhox":3, \
+    }
+    # Physical limits of each perturbed card
+    CARD_LIMITS = {\
+        "tday":(-90, 60), \
+        "qco2":(0, 10000), \
+        "tau550":(0, 5), \
+        "rhox":(0, 1), \
+    }
+    # Distributions and their number of parameters
+    DISTS = {\
+        "normal":2, \
+        "uniform":2, \
+        "lognormal":2, \
+        "triangular":3, \
+    }
+
+    def __init__(self, procsmarts, perturb, members=20, percentiles=(5, 50, 95), \
+        seed=None, block=256, log=None):
+        """
+        | Initializes the ensemble runner
+
+        Parameters
+        ----------
+        procsmarts : procSMARTS
+            SMARTS processor holding the input dataframe and runid
+        perturb : string or dict
+            perturbation for each card, see parse_perturb
+        members : int
+            number of ensemble members
+        percentiles : list
+            percentiles to report, 0 to 100
+        seed : int
+            seed for the random draws
+        block : int
+            number of rows scheduled together.  Member outputs are only held
+            for one block.
+        log : Logging Object
+            Logging object to print messages to a logfile
+        """
+        self.procsmarts = procsmarts
+        self.perturb = self.parse_perturb(perturb) if isinstance(perturb, str) else perturb
+        self.members = members
+        self.percentiles = list(percentiles)
+        self.rng = np.random.default_rng(seed)
+        self.block = block
+        self.log = log
+        return
+
+    def parse_perturb(self, spec):
+        """
+        | Parse card perturbations from the command line, as comma separated
+        | CARD=DIST:P1:P2[:P3].  normal takes mean:sd, uniform takes low:high,
+        | lognormal takes median:geometric_sd, and triangular takes
+        | low:mode:high.  For example "tau550=lognormal:0.2:1.5,rhox=uniform:0.15:0.35".
+        | Parameters numpy can't draw from raise a ValueError.
+
+        Parameters
+        ----------
+        spec : string
+            perturbation specification
+
+        Returns
+        -------
+        perturb : dict
+            card: (distribution, parameters)
+        """
+        perturb = {}
+        for entry in spec.split(','):
+            entry = entry.strip()
+            if not entry:
+                continue
+            card, _, dist = entry.partition('=')
+            parts = dist.split(':')
+            if card not in self.CARD_ROUND:
+                raise ValueError(f"Card {card} can't be perturbed, options: {list(self.CARD_ROUND)}")
+            if parts[0] not in self.DISTS or len(parts) - 1 != self.DISTS[parts[0]]:
+                raise ValueError(f"Perturbation {entry} must be CARD=DIST:PARAMS with DIST in {list(self.DISTS)}")
+            par = [float(val) for val in parts[1:]]
+            if parts[0] == "normal" and par[1] < 0:
+                raise ValueError(f"Perturbation {entry} needs sd >= 0")
+            if parts[0] == "uniform" and par[0] > par[1]:
+                raise ValueError(f"Perturbation {entry} needs low <= high")
+            if parts[0] == "lognormal" and (par[0] <= 0 or par[1] <= 1):
+                raise ValueError(f"Perturbation {entry} needs median > 0 and geometric sd > 1")
+            if parts[0] == "triangular" and (not par[0] <= par[1] <= par[2] or par[0] == par[2]):
+                raise ValueError(f"Perturbation {entry} needs low <= mode <= high and low < high")
+            perturb[card] = (parts[0], par)
+        return perturb
+
+    def draw(self):
+        """
+        | Draw the card values of every member, rounded and clipped so they
+        | are valid SMARTS inputs.
+
+        Returns
+        -------
+        cards : list
+            one dict of card values per member
+        """
+        cards = [dict(self.procsmarts.CARDS) for _ in range(self.members)]
+        for card, (dist, par) in self.perturb.items():
+            if dist == "normal":
+                vals = self.rng.normal(par[0], par[1], self.members)
+            elif dist == "uniform":
+                vals = self.rng.uniform(par[0], par[1], self.members)
+            elif dist == "lognormal":
+                vals = self.rng.lognormal(np.log(par[0]), np.log(par[1]), self.members)
+            else:
+                vals = self.rng.triangular(par[0], par[1], par[2], self.members)
+            vals = np.clip(np.round(vals, self.CARD_ROUND[card]), *self.CARD_LIMITS[card])
+            for member, val in enumerate(vals):
+                cards[member][card] = int(val) if self.CARD_ROUND[card] == 0 else float(val)
+        return cards
+
+    def run(self):
+        """
+        | Run every member for every row and reduce as blocks finish.  Night
+        | rows are predicted once and never sent to SMARTS.  Within a block,
+        | identical decks are only run once, and the shared CARD4 to CARD17
+        | text is built once per member.  Member outputs are deleted after
+        | they are parsed.  Rows missing a time or location are set to -1.
+
+        Returns
+        -------
+        outarray : list
+            ensemble mean per row, or the negative code when no member worked
+        """
+        proc = self.procsmarts
+        proc.get_heads()
+        proc.keep = False
+        cards = self.draw()
+        if self.log: self.log.info(f"Ensemble of {self.members} members over {list(self.perturb)}")
+        nrows = len(proc.indf)
+        stats = BlockStats(nrows, self.percentiles)
+        codes = np.zeros(nrows)
+        nruns = 0
+        ndecks = 0
+        for start in range(0, nrows, self.block):
+            # Build the decks of the block, keyed on everything but CARD1
+            decks = {}
+            jobs = []
+            for pos in range(start, min(start + self.block, nrows)):
+                idx = proc.indf.index[pos]
+                proc.load_row(idx, proc.indf.iloc[pos])
+                if missing(proc.dfv["hyr"], proc.dfv["hmon"], proc.dfv["hday"], \
+                    proc.dfv["hhr"], proc.dfv["hlat"], proc.dfv["hlon"]):
+                    if self.log: self.log.warning(f"Row {idx} has a missing time or location, setting to -1")
+                    codes[pos] = -1
+                    continue
+                if is_night(proc.dfv["hyr"], proc.dfv["hmon"], proc.dfv["hday"], \
+                    proc.dfv["hhr"], proc.dfv["hlat"], proc.dfv["hlon"]):
+                    codes[pos] = -2
+                    continue
+                time_card = proc.deck_time()
+                for member in range(self.members):
+                    proc.cards = cards[member]
+                    body = proc.deck_site("").split('\n', 1)[1] + proc.deck_static() + time_card
+                    if body not in decks:
+                        decks[body] = len(decks)
+                    jobs.append((pos, member, decks[body]))
+            ndecks += len(jobs)
+            nruns += len(decks)
+
+            # Write and run the unique decks
+            inplist = []
+            for body, num in decks.items():
+                idx_zstr = f"E{start // self.block:05d}{num:06d}"
+                proc.write_inp(idx_zstr, "\'" + idx_zstr + "_allbirds\'\n" + body)
+                inplist.append(proc.pwd + "/data/smarts_inp/" + proc.runid + '_' + idx_zstr + ".inp.txt")
+            try:
+                results = proc.run_decks(inplist)
+            finally:
+                for inp in inplist:
+                    try:
+                        os.remove(inp)
+                    except FileNotFoundError:
+                        pass
+            results = pd.to_numeric(pd.Series(results, dtype=object), errors="coerce").fillna(-1).to_numpy()
+
+            # Gather the members of the block and reduce them
+            jobs = np.array(jobs, dtype=int).reshape(-1, 3)
+            vals = results[jobs[:, 2]]
+            good = vals >= 0
+            block = np.full((min(self.block, nrows - start), self.members), np.nan)
+            block[jobs[good, 0] - start, jobs[good, 1]] = vals[good]
+            stats.update(start, block)
+            # Rows where no member worked report the code of the first failure
+            bad, first = np.unique(jobs[~good, 0], return_index=True)
+            codes[bad] = vals[~good][first]
+            if self.log: self.log.info(f"Ensemble rows {start} to {start + self.block}, {len(decks)} unique decks")
+        proc.cards = dict(proc.CARDS)
+        if self.log: self.log.info(f"Ensemble ran {nruns} SMARTS decks for {ndecks} row-members")
+
+        # Gather the reductions as the run output
+        valid = stats.count > 0
+        proc.outarray = [f"{val:.6g}" if ok else int(code) for val, ok, code in zip(stats.mean, valid, codes)]
+        extra = {"SMARTSstd": stats.std}
+        for ii, pct in enumerate(self.percentiles):
+            extra[f"SMARTSp{pct:g}"] = stats.pcts[:, ii]
+        extra["SMARTSn"] = stats.count
+        proc.extra = pd.DataFrame(extra)
+        proc.save_output()
+        return proc.outarray
@@ -18,7 +18,8 @@ __maintainer__ = "Wesley T. Honeycutt"
 __email__ = "honeycutt@ou.edu"
 __status__ = "alpha"
 
-
+from datetime import datetime
+import logging
 
 
 class FancyLog():
@@ -26,9 +27,6 @@ class FancyLog():
     | Nested class which provides fancy options for logging as a oneliner in main
     """
 
-    import logging
-    from datetime import datetime
-
     loglvl = None
     makelog = None
     filename = "/dev/null"
@@ -63,11 +61,11 @@ class FancyLog():
             logging object similar to the original import
         """
         # create logger with file name
-        logger = self.logging.getLogger(__file__)
-        logger.setLevel(self.logging.DEBUG)
+        logger = logging.getLogger(__file__)
+        logger.setLevel(logging.DEBUG)
 
         # create console handler with a higher log level
-        lch = self.logging.StreamHandler()
+        lch = logging.StreamHandler()
         lch.setLevel(self.loglvl)
         # Apply our settings
         lch.setFormatter(self.LogFormatterColors())
@@ -81,8 +79,8 @@ class FancyLog():
                 self.filename = self.logpath
             else:
                 self.filename = "./"
-            self.filename += "log-" + str(self.datetime.now().strftime("%Y-%m-%d_%H:%M:%S")) + ".log"
-            lfh = self.logging.FileHandler(self.filename)
+            self.filename += "log-" + str(datetime.now().strftime("%Y-%m-%d_%H:%M:%S")) + ".log"
+            lfh = logging.FileHandler(self.filename)
             lfh.setLevel(self.loglvl)
             # Apply settings without color
             lfh.setFormatter(self.LogFormatterBoring())
@@ -102,7 +100,6 @@ class FancyLog():
         logging.Formatter : logging.Formatter object
             Object function pass
         """
-        import logging
         # Color list, terminal format
         grey = "\x1b[38;20m"
         cyan = "\x1b[0;36m"
@@ -119,6 +116,8 @@ class FancyLog():
             logging.ERROR: red + strformat + reset,
             logging.CRITICAL: panic_red + strformat + reset
         }
+        # Build the formatters once instead of for every record
+        FORMATTERS = {lvl: logging.Formatter(fmt) for lvl, fmt in FORMATS.items()}
 
         def format(self, record):
             """
@@ -129,8 +128,9 @@ class FancyLog():
             record : logging.LogRecord object
                 stores the information from the log input when attached via call.
             """
-            log_fmt = self.FORMATS.get(record.levelno)
-            formatter = self.logging.Formatter(log_fmt)
+            formatter = self.FORMATTERS.get(record.levelno)
+            if formatter is None:
+                formatter = logging.Formatter()
             return formatter.format(record)
 
     class LogFormatterBoring(logging.Formatter):
@@ -143,7 +143,6 @@ class FancyLog():
         logging.Formatter : logging.Formatter object
             Object function pass
         """
-        import logging
         strformat = "%(asctime)s,%(name)s,%(levelname)s,%(message)s,line:%(lineno)d"
         FORMATS = {
             logging.DEBUG: strformat,
@@ -152,6 +151,7 @@ class FancyLog():
             logging.ERROR: strformat,
             logging.CRITICAL: strformat
         }
+        FORMATTERS = {lvl: logging.Formatter(fmt) for lvl, fmt in FORMATS.items()}
 
         def format(self, record):
             """
@@ -162,6 +162,7 @@ class FancyLog():
             record : logging.LogRecord object
                 stores the information from the log input when attached via call.
             """
-            log_fmt = self.FORMATS.get(record.levelno)
-            formatter = self.logging.Formatter(log_fmt)
+            formatter = self.FORMATTERS.get(record.levelno)
+            if formatter is None:
+                formatter = logging.Formatter()
             return formatter.format(record)
@@ -0,0 +1,174 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+Resource-aware governor for concurrent SMARTS workers
+"""
+
+# Backwards Comaptibility
+from __future__ import print_function
+
+# dunders
+__author__ = "Wesley T. Honeycutt"
+__copyright__ = "Copyright 2025"
+__credits__ = ["Wesley T. Honeycutt"]
+__license__ = "GPL-3.0"
+__version__ = "0.1.0"
+__maintainer__ = "Wesley T. Honeycutt"
+__email__ = "honeycutt@ou.edu"
+__status__ = "alpha"
+
+import os
+import psutil
+import time
+
+# Bytes in a megabyte, all limits below are given in MB
+MB = 1024 * 1024
+
+
+class Governor:
+    """
+    | Samples the host and scales the number of SMARTS workers.  Workers ramp
+    | up while the CPU has headroom, back off under CPU, memory, or disk write
+    | pressure, and stop entirely while the data volume is short on space.
+    """
+    log = None
+    path = None
+    maxworkers = None
+    target = 1
+    paused = False
+    last = None
+    lastwrite = None
+
+    def __init__(self, path, maxworkers=None, minfree=1024, minmem=512, \
+        maxwrite=50, cpuhigh=90, cpulow=70, interval=2.0, log=None):
+        """
+        | Initializes the governor
+
+        Parameters
+        ----------
+        path : string
+            directory on the volume which receives the output
+        maxworkers : int
+            upper limit of concurrent workers.  Defaults to the cpu count.
+        minfree : float
+            MB of free disk under which new runs are paused
+        minmem : float
+            MB of available memory under which workers are cut back
+        maxwrite : float
+            MB/s of disk writes over which workers are removed
+        cpuhigh, cpulow : float
+            CPU percent above which workers are removed, and below which
+            workers are added
+        interval : float
+            seconds between samples
+        log : Logging Object
+            Logging object to print messages to a logfile
+        """
+        self.path = path
+        self.maxworkers = maxworkers if maxworkers else (os.cpu_count() or 1)
+        self.minfree = minfree * MB
+        self.minmem = minmem * MB
+        self.maxwrite = maxwrite * MB
+        self.cpuhigh = cpuhigh
+        self.cpulow = cpulow
+        self.interval = interval
+        self.log = log
+        # Prime the counters, the first cpu_percent call is meaningless
+        psutil.cpu_percent(interval=None)
+        self.lastwrite = self.write_bytes()
+        self.last = time.monotonic()
+        if self.log: self.log.info(f"Governor allows up to {self.maxworkers} workers")
+        # Don't start a run on a full disk, even before the first sample
+        free = psutil.disk_usage(self.path).free
+        if free < self.minfree:
+            if self.log: self.log.warning(f"Governor pausing, {free / MB:.0f} MB free on {self.path}")
+            self.paused = True
+        return
+
+    def write_bytes(self):
+        """
+        | Total bytes written by the host disks, 0 if unavailable.
+
+        Returns
+        -------
+        written : int
+        """
+        counters = psutil.disk_io_counters()
+        return counters.write_bytes if counters is not None else 0
+
+    def sample(self):
+        """
+        | Sample the host.
+
+        Returns
+        -------
+        stats : dict
+            cpu percent, available memory, disk write rate, and free disk
+            space on the output volume
+        """
+        now = time.monotonic()
+        written = self.write_bytes()
+        wrate = max(0, written - self.lastwrite) / max(now - self.last, 1e-6)
+        self.lastwrite = written
+        self.last = now
+        stats = {\
+            "cpu": psutil.cpu_percent(interval=None), \
+            "mem": psutil.virtual_memory().available, \
+            "wrate": wrate, \
+            "free": psutil.disk_usage(self.path).free, \
+        }
+        return stats
+
+    def update(self, force=False):
+        """
+        | Resample the host if the interval has passed and adjust the worker
+        | target.  Changes are logged.
+
+        Parameters
+        ----------
+        force : bool
+            sample even if the interval has not passed
+
+        Returns
+        -------
+        target : int
+            number of workers which should be running, 0 while paused
+        """
+        if not force and time.monotonic() - self.last < self.interval:
+            return 0 if self.paused else self.target
+        stats = self.sample()
+        target = self.target
+        why = []
+
+        # Disk space comes first, SMARTS output can't be written to a full disk
+        if stats["free"] < self.minfree:
+            if not self.paused:
+                if self.log: self.log.warning(f"Governor pausing, {stats['free'] / MB:.0f} MB free on {self.path}")
+            self.paused = True
+            return 0
+        if self.paused:
+            if self.log: self.log.warning(f"Governor resuming, {stats['free'] / MB:.0f} MB free on {self.path}")
+            self.paused = False
+
+        # Memory and CPU set the number of workers
+        if stats["mem"] < self.minmem:
+            target = max(1, target // 2)
+            why.append(f"mem {stats['mem'] / MB:.0f} MB")
+        elif stats["cpu"] > self.cpuhigh:
+            target = max(1, target - 1)
+            why.append(f"cpu {stats['cpu']:.0f}%")
+        elif stats["cpu"] < self.cpulow:
+            idle = (1 - stats["cpu"] / 100) * (os.cpu_count() or 1)
+            target = min(self.maxworkers, target + max(1, int(idle / 2)))
+            why.append(f"cpu {stats['cpu']:.0f}%")
+
+        # Heavy disk writes cost a worker, SMARTS output is what gets written
+        if stats["wrate"] > self.maxwrite:
+            target = max(1, target - 1)
+            why.append(f"writes {stats['wrate'] / MB:.1f} MB/s")
+
+        if target != self.target:
+            if self.log: self.log.info(f"Governor workers {self.target}->{target} ({', '.join(why)})")
+        self.target = target
+        return self.target
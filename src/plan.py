@@ -0,0 +1,190 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+Dry-run planning of a RadiantRoutes run without the scientific stack
+"""
+
+# Backwards Comaptibility
+from __future__ import print_function
+
+# dunders
+__author__ = "Wesley T. Honeycutt"
+__copyright__ = "Copyright 2025"
+__credits__ = ["Wesley T. Honeycutt"]
+__license__ = "GPL-3.0"
+__version__ = "0.1.0"
+__maintainer__ = "Wesley T. Honeycutt"
+__email__ = "honeycutt@ou.edu"
+__status__ = "alpha"
+
+import csv
+
+from src.procSMARTS import procSMARTS
+from src.solarpos import is_night, missing
+
+
+def num(val):
+    """
+    | Convert a csv string to int or float when possible, like pandas would.
+    | Blank cells become NaN.
+
+    Parameters
+    ----------
+    val : string
+
+    Returns
+    -------
+    val : int, float, or string
+    """
+    if val is None or val.strip() == '':
+        return float("nan")
+    try:
+        return int(val)
+    except ValueError:
+        pass
+    try:
+        return float(val)
+    except ValueError:
+        return val
+
+
+class procPlan:
+    """
+    Report what a run would do, reading the csv with the standard library
+    """
+    infile = None
+    log = None
+    report = None
+
+    def __init__(self, infile, dfhd, dfopt, runid, pwd, profile=False, members=0, log=None):
+        """
+        | Initializes the planner
+
+        Parameters
+        ----------
+        infile : string
+            path to the input csv
+        dfhd : dict
+            valid header names, see DFHD in RadiantRoutes
+        dfopt : list
+            keys of dfhd which are optional
+        runid : string
+            run identifier
+        pwd : string
+            working directory
+        profile : bool
+            plan for profile mode
+        members : int
+            plan for an ensemble of this many members, 0 for none
+        log : Logging Object
+            Logging object to print messages to a logfile
+        """
+        self.infile = infile
+        self.dfhd = dfhd
+        self.dfopt = dfopt
+        self.profile = profile
+        self.members = members
+        self.log = log
+        # Reuse the deck logic of the processor, it doesn't need pandas
+        self.proc = procSMARTS(None, runid, dfhd, pwd, profile=profile, log=log)
+        return
+
+    def run(self):
+        """
+        | Resolve headers, count rows, and predict nighttime skips, failed
+        | rows, and SMARTS invocations.  Ensembles ignore profile mode, like
+        | the real run.  Rows missing a time or location are counted as
+        | failed and never checked for night.
+
+        Returns
+        -------
+        report : dict
+        """
+        self.report = {"headers": {}, "missing": [], "rows": 0, "night": 0, "failed": 0, "invocations": 0}
+        with open(self.infile, 'r', newline='') as infile:
+            reader = csv.DictReader(infile)
+            headers = reader.fieldnames or []
+            for key in self.dfhd:
+                matches = [head for head in self.dfhd[key] if head in headers]
+                self.report["headers"][key] = matches[0] if matches else None
+                if not matches and key not in self.dfopt:
+                    self.report["missing"].append(key)
+            if self.report["missing"]:
+                if self.log: self.log.error(f"Missing headers {self.report['missing']}, can't plan further")
+                return self.report
+            for key in self.proc.dfc:
+                self.proc.dfc[key] = [head for head in self.proc.dfc[key] if head in headers][0]
+            numeric = [self.proc.dfc[key] for key in self.proc.dfc if key != "hseas"]
+
+            geom = ["hyr", "hmon", "hday", "hhr", "hlat", "hlon"]
+            groups = {}
+            lost = set()
+            for idx, row in enumerate(reader):
+                for head in numeric:
+                    row[head] = num(row[head])
+                self.proc.load_row(idx, row)
+                self.report["rows"] += 1
+                if self.members:
+                    # Ensembles set rows missing a time or location to -1
+                    if missing(*[self.proc.dfv[key] for key in geom]):
+                        self.report["failed"] += 1
+                    elif is_night(*[self.proc.dfv[key] for key in geom]):
+                        self.report["night"] += 1
+                    else:
+                        self.report["invocations"] += self.members
+                    continue
+                if not self.profile:
+                    # SMARTS still runs rows missing a time or location, and fails
+                    if missing(*[self.proc.dfv[key] for key in geom]):
+                        self.report["failed"] += 1
+                    else:
+                        self.report["night"] += is_night(*[self.proc.dfv[key] for key in geom])
+                    self.report["invocations"] += 1
+                    continue
+                # Profile mode, the geometry is checked once per profile
+                gkey = tuple(self.proc.dfv[key] for key in self.proc.prof_keys)
+                if missing(*gkey):
+                    # Profiles missing a key are set to -1 without a deck
+                    lost.add(tuple(None if missing(val) else val for val in gkey))
+                    self.report["failed"] += 1
+                    continue
+                if gkey not in groups:
+                    night = is_night(self.proc.dfv["hyr"], self.proc.dfv["hmon"], self.proc.dfv["hday"], \
+                        self.proc.dfv["hhr"], self.proc.dfv["hlat"], self.proc.dfv["hlon"])
+                    groups[gkey] = None if night else set()
+                if groups[gkey] is None:
+                    self.report["night"] += 1
+                else:
+                    groups[gkey].add(self.proc.profile_bin())
+            if self.profile and not self.members:
+                self.report["profiles"] = len(groups) + len(lost)
+                self.report["invocations"] = sum(len(bins) for bins in groups.values() if bins is not None)
+        return self.report
+
+    def print_report(self):
+        """
+        | Print the plan to stdout.
+        """
+        print(f"Input: {self.infile}")
+        for key, head in self.report["headers"].items():
+            state = head if head is not None else ("not found (optional)" if key in self.dfopt else "NOT FOUND")
+            print(f"  {key:10s} -> {state}")
+        if self.report["missing"]:
+            print(f"Missing required headers: {', '.join(self.report['missing'])}")
+            return
+        print(f"Rows: {self.report['rows']}")
+        print(f"Rows missing a time or location (fail): {self.report['failed']}")
+        if self.members:
+            if self.profile:
+                print(f"Profile mode is not used by ensembles")
+            print(f"Predicted nighttime rows skipped: {self.report['night']}")
+            print(f"Estimated SMARTS invocations: up to {self.report['invocations']} ({self.members} members)")
+        elif self.profile:
+            print(f"Profiles: {self.report['profiles']}")
+            print(f"Predicted nighttime rows skipped: {self.report['night']}")
+            print(f"Estimated SMARTS invocations: {self.report['invocations']}")
+        else:
+            print(f"Predicted nighttime rows (SMARTS aborts): {self.report['night']}")
+            print(f"Estimated SMARTS invocations: {self.report['invocations']}")
+        return
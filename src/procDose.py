@@ -0,0 +1,269 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+Cumulative radiant dose per track
+"""
+
+# Backwards Comaptibility
+from __future__ import print_function
+
+# dunders
+__author__ = "Wesley T. Honeycutt"
+__copyright__ = "Copyright 2025"
+__credits__ = ["Wesley T. Honeycutt"]
+__license__ = "GPL-3.0"
+__version__ = "0.1.0"
+__maintainer__ = "Wesley T. Honeycutt"
+__email__ = "honeycutt@ou.edu"
+__status__ = "alpha"
+
+import numpy as np
+import pandas as pd
+
+
+def epoch_seconds(indf, dfc):
+    """
+    | Seconds since 1970 for each row, from the date and time columns.
+
+    Parameters
+    ----------
+    indf : Pandas dataframe
+    dfc : dict
+        resolved header names for hyr, hmon, hday, hhr, hmin, and hsec
+
+    Returns
+    -------
+    tsec : numpy array
+        float seconds, NaN where a date or time field is missing
+    """
+    times = pd.to_datetime(pd.DataFrame({\
+        "year": indf[dfc["hyr"]], \
+        "month": indf[dfc["hmon"]], \
+        "day": indf[dfc["hday"]], \
+        "hour": indf[dfc["hhr"]], \
+        "minute": indf[dfc["hmin"]], \
+        "second": indf[dfc["hsec"]], \
+    }))
+    tsec = (times - pd.Timestamp("1970-01-01")) / pd.Timedelta(seconds=1)
+    return np.floor(tsec.to_numpy(dtype=float))
+
+
+class procDose:
+    """
+    Time-integrate the SMARTS output over each track
+    """
+    indf = None
+    irrdf = None
+    log = None
+    pwd = None
+    maxgap = None
+    fail = "gap"
+    outdf = None
+    # Output code for nighttime, counted as zero irradiance
+    NIGHT = -2
+    # Policies for failed rows (-1, -3, -4)
+    FAILS = ["gap", "interp"]
+    # Storage for the name listed in the df header
+    dfc = {\
+        "htrack":None, \
+        "hyr":None, \
+        "hmon":None, \
+        "hday":None, \
+        "hhr":None, \
+        "hmin":None, \
+        "hsec":None, \
+    }
+
+    def __init__(self, indf, irrdf, dfhd, pwd, maxgap=None, fail="gap", log=None):
+        """
+        | Initializes the dose aggregator
+
+        Parameters
+        ----------
+        indf : Pandas dataframe
+            input dataframe, in the same row order as irrdf
+        irrdf : Pandas dataframe
+            SMARTSirr and any band columns for each row of indf
+        dfhd : dict
+            valid header names, see DFHD in RadiantRoutes
+        pwd : string
+            working directory for the output
+        maxgap : float
+            longest interval in seconds between fixes which is integrated.
+            Longer intervals are left out of the dose.  Defaults to no limit.
+        fail : string
+            "gap" leaves intervals touching a failed row out of the dose,
+            "interp" fills failed rows linearly in time within the track
+        log : Logging Object
+            Logging object to print messages to a logfile
+        """
+        if fail not in self.FAILS:
+            raise ValueError(f"Failure policy {fail} not in {self.FAILS}")
+        self.indf = indf
+        self.irrdf = irrdf
+        self.dfc = {\
+            "htrack":dfhd["dftrack"], \
+            "hyr":dfhd["dfyear"], \
+            "hmon":dfhd["dfmon"], \
+            "hday":dfhd["dfday"], \
+            "hhr":dfhd["dfhr"], \
+            "hmin":dfhd["dfmin"], \
+            "hsec":dfhd["dfsec"], \
+        }
+        self.pwd = pwd
+        self.maxgap = maxgap
+        self.fail = fail
+        self.log = log
+        return
+
+    def get_heads(self):
+        """
+        | Get the appropriate header names from the DF
+
+        Returns
+        -------
+        found : bool
+            False if a required header is missing
+        """
+        headers = list(self.indf.columns.values)
+        for key in self.dfc:
+            matches = [head for head in self.dfc[key] if head in headers]
+            if len(matches) == 0:
+                if self.log: self.log.error(f"No header for {key} from {self.dfc[key]}, can't aggregate dose")
+                return False
+            if len(matches) > 1:
+                if self.log: self.log.warning(f"Using first match for {key}")
+            self.dfc[key] = matches[0]
+        return True
+
+    def fill_fails(self, tsec, codes, vals):
+        """
+        | Linearly interpolate failed values between the nearest good values
+        | of the same track, column by column.  Values at the ends of a track
+        | stay NaN.  Requires arrays sorted by track then time.
+
+        Parameters
+        ----------
+        tsec : numpy array
+            time in seconds
+        codes : numpy array
+            integer track code
+        vals : numpy array
+            (rows x columns) values with NaN for failed rows
+
+        Returns
+        -------
+        vals : numpy array
+        """
+        pos = np.arange(len(tsec))
+        nfill = 0
+        for ii in range(vals.shape[1]):
+            good = np.isfinite(vals[:, ii])
+            prev = np.maximum.accumulate(np.where(good, pos, -1))
+            nxt = np.minimum.accumulate(np.where(good, pos, len(pos))[::-1])[::-1]
+            fill = ~good & (prev >= 0) & (nxt < len(pos))
+            prev = prev[fill]
+            nxt = nxt[fill]
+            same = codes[prev] == codes[nxt]
+            idx = pos[fill][same]
+            prev = prev[same]
+            nxt = nxt[same]
+            span = (tsec[nxt] - tsec[prev]).astype(float)
+            frac = np.divide(tsec[idx] - tsec[prev], span, out=np.zeros(len(idx)), where=span > 0)
+            vals[idx, ii] = vals[prev, ii] + frac * (vals[nxt, ii] - vals[prev, ii])
+            nfill += len(idx)
+        if self.log: self.log.info(f"Interpolated {nfill} failed values")
+        return vals
+
+    def aggregate(self):
+        """
+        | Integrate each irradiance column over time for every track with the
+        | trapezoidal rule.  Rows are sorted once by (track, time) and all
+        | tracks are reduced together, so no per-track python loop is needed.
+        | Nighttime rows count as zero irradiance.  Failed values are handled
+        | by the failure policy, separately for each column.
+
+        Returns
+        -------
+        outdf : Pandas dataframe
+            one row per track
+        """
+        if not self.get_heads():
+            return None
+        tsec = epoch_seconds(self.indf, self.dfc)
+        codes, tracks = pd.factorize(self.indf[self.dfc["htrack"]])
+        irr = pd.to_numeric(self.irrdf["SMARTSirr"], errors="coerce").to_numpy(dtype=float)
+        cols = list(self.irrdf.columns)
+        vals = np.array(self.irrdf.apply(pd.to_numeric, errors="coerce"), dtype=float)
+        night = irr == self.NIGHT
+        failed = ~night & ~(irr >= 0)
+        vals[night] = 0.0
+        vals[failed] = np.nan
+
+        ntracks = len(tracks)
+        notime = np.isnan(tsec)
+        n_notime = np.bincount(codes[notime & (codes >= 0)], minlength=ntracks)
+
+        # Single sort by track, then time, leaving out rows without a track
+        # or without a timestamp
+        order = np.lexsort((tsec, codes))
+        if (codes < 0).any():
+            if self.log: self.log.warning(f"{(codes < 0).sum()} rows have no track id, skipping")
+        if notime.any():
+            if self.log: self.log.warning(f"{notime.sum()} rows have a missing date or time, skipping")
+        order = order[(codes[order] >= 0) & ~notime[order]]
+        if len(order) == 0:
+            if self.log: self.log.error(f"No rows with both a track id and a timestamp, can't aggregate dose")
+            return None
+        tsec = tsec[order].astype(np.int64)
+        codes = codes[order]
+        vals = vals[order]
+        if self.fail == "interp":
+            vals = self.fill_fails(tsec, codes, vals)
+
+        # Intervals between consecutive fixes of the same track
+        dt = np.diff(tsec).astype(float)
+        same = codes[1:] == codes[:-1]
+        if self.maxgap is not None:
+            same &= dt <= self.maxgap
+        owner = codes[:-1]
+
+        out = {"track": tracks}
+        out["n_fixes"] = np.bincount(codes, minlength=ntracks)
+        out["n_night"] = np.bincount(codes[night[order]], minlength=ntracks)
+        out["n_fail"] = np.bincount(codes[failed[order]], minlength=ntracks)
+        out["n_notime"] = n_notime
+        # Tracks with no timestamped rows keep NaN start and end
+        first = np.r_[True, codes[1:] != codes[:-1]]
+        last = np.r_[codes[1:] != codes[:-1], True]
+        start = np.full(ntracks, np.nan)
+        end = np.full(ntracks, np.nan)
+        start[codes[first]] = tsec[first]
+        end[codes[last]] = tsec[last]
+        out["start"] = pd.to_datetime(start, unit='s')
+        out["end"] = pd.to_datetime(end, unit='s')
+        out["duration_s"] = end - start
+        # Each column has its own gaps, a band can fail where SMARTSirr didn't
+        for ii, col in enumerate(cols):
+            ok = same & np.isfinite(vals[1:, ii]) & np.isfinite(vals[:-1, ii])
+            covered = np.bincount(owner[ok], weights=dt[ok], minlength=ntracks)
+            contrib = 0.5 * (vals[1:, ii] + vals[:-1, ii]) * dt
+            dose = np.bincount(owner[ok], weights=contrib[ok], minlength=ntracks)
+            out["covered_" + col] = covered
+            out["dose_" + col] = dose
+            out["mean_" + col] = np.divide(dose, covered, out=np.full(ntracks, np.nan), where=covered > 0)
+        self.outdf = pd.DataFrame(out)
+        if self.log: self.log.info(f"Aggregated dose for {ntracks} tracks over {len(tsec)} rows")
+        return self.outdf
+
+    def save_output(self):
+        """
+        | Write the per-track dose to SMARTS_dose.csv
+        """
+        if self.outdf is None:
+            if self.log: self.log.error(f"No dose to save, run aggregate first")
+            return
+        self.outdf.to_csv(self.pwd + "/SMARTS_dose.csv", index=False)
+        if self.log: self.log.info(f"Saved dose as {self.pwd}/SMARTS_dose.csv")
+        return
@@ -0,0 +1,387 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+Binned, rasterized plots of RadiantRoutes output
+"""
+
+# Backwards Comaptibility
+from __future__ import print_function
+
+# dunders
+__author__ = "Wesley T. Honeycutt"
+__copyright__ = "Copyright 2025"
+__credits__ = ["Wesley T. Honeycutt"]
+__license__ = "GPL-3.0"
+__version__ = "0.1.0"
+__maintainer__ = "Wesley T. Honeycutt"
+__email__ = "honeycutt@ou.edu"
+__status__ = "alpha"
+
+import os
+
+import matplotlib
+matplotlib.use("Agg")
+import matplotlib.pyplot as plt
+import numpy as np
+import pandas as pd
+
+from src.procDose import epoch_seconds
+
+
+class procPlot:
+    """
+    | Plot run output without holding it in memory.  The input csv and
+    | SMARTS_irr.csv are streamed together in chunks and reduced into fixed
+    | size bins, so the figures only ever draw the binned arrays.
+    """
+    infile = None
+    irrfile = None
+    dosefile = None
+    log = None
+    column = "SMARTSirr"
+    outdir = None
+    chunksize = 200000
+    # Bins of the map, the season time series, and each track
+    mapbins = 200
+    timebins = 2000
+    trackbins = 500
+    # Number of tracks with their own panel, the ones with the most fixes
+    ntracks = 12
+    # Output code for nighttime, plotted as zero irradiance
+    NIGHT = -2
+    # Storage for the name listed in the df header
+    dfc = {\
+        "hyr":None, \
+        "hmon":None, \
+        "hday":None, \
+        "hhr":None, \
+        "hmin":None, \
+        "hsec":None, \
+        "hlat":None, \
+        "hlon":None, \
+        "htrack":None, \
+    }
+
+    def __init__(self, infile, dfhd, pwd, irrfile=None, dosefile=None, column="SMARTSirr", \
+        outdir=None, ntracks=12, log=None):
+        """
+        | Initializes the plotter
+
+        Parameters
+        ----------
+        infile : string
+            path to the input csv of the run
+        dfhd : dict
+            valid header names, see DFHD in RadiantRoutes
+        pwd : string
+            working directory
+        irrfile : string
+            run output.  Default=pwd/SMARTS_irr.csv
+        dosefile : string
+            per-track dose output.  Default=pwd/SMARTS_dose.csv if it exists
+        column : string
+            column of irrfile to plot
+        outdir : string
+            directory for the figures.  Default=pwd/plots
+        ntracks : int
+            number of tracks with their own panel
+        log : Logging Object
+            Logging object to print messages to a logfile
+        """
+        self.infile = infile
+        self.irrfile = irrfile if irrfile is not None else pwd + "/SMARTS_irr.csv"
+        self.dosefile = dosefile if dosefile is not None else pwd + "/SMARTS_dose.csv"
+        self.column = column
+        self.outdir = outdir if outdir is not None else pwd + "/plots"
+        self.ntracks = ntracks
+        self.log = log
+        self.dfc = {\
+            "hyr":dfhd["dfyear"], \
+            "hmon":dfhd["dfmon"], \
+            "hday":dfhd["dfday"], \
+            "hhr":dfhd["dfhr"], \
+            "hmin":dfhd["dfmin"], \
+            "hsec":dfhd["dfsec"], \
+            "hlat":dfhd["dflat"], \
+            "hlon":dfhd["dflon"], \
+            "htrack":dfhd["dftrack"], \
+        }
+        return
+
+    def get_heads(self):
+        """
+        | Get the appropriate header names from the csv.  The track header is
+        | optional.
+
+        Returns
+        -------
+        found : bool
+            False if a required header is missing
+        """
+        headers = list(pd.read_csv(self.infile, nrows=0).columns.values)
+        for key in self.dfc:
+            matches = [head for head in self.dfc[key] if head in headers]
+            if len(matches) == 0:
+                if key == "htrack":
+                    self.dfc[key] = None
+                    continue
+                if self.log: self.log.error(f"No header for {key} from {self.dfc[key]}, can't plot")
+                return False
+            self.dfc[key] = matches[0]
+        return True
+
+    def chunks(self):
+        """
+        | Stream the input csv and the run output together.
+
+        Yields
+        ------
+        tsec : numpy array
+            seconds since 1970
+        lat, lon : numpy array
+        track : Pandas series
+            track id, or None without a track header
+        vals : numpy array
+            plotted column, nighttime as zero and failures as NaN
+        """
+        usecols = [head for head in self.dfc.values() if head is not None]
+        inreader = pd.read_csv(self.infile, usecols=usecols, chunksize=self.chunksize)
+        irrreader = pd.read_csv(self.irrfile, usecols=list(dict.fromkeys(["SMARTSirr", self.column])), chunksize=self.chunksize)
+        for indf, irrdf in zip(inreader, irrreader):
+            indf = indf.iloc[:len(irrdf)]
+            code = pd.to_numeric(irrdf["SMARTSirr"], errors="coerce").to_numpy(dtype=float)
+            vals = np.array(pd.to_numeric(irrdf[self.column], errors="coerce"), dtype=float)
+            vals[code == self.NIGHT] = 0.0
+            vals[~(vals >= 0)] = np.nan
+            # Rows without a timestamp can't be placed in time, leave them out
+            tsec = epoch_seconds(indf, self.dfc)
+            keep = ~np.isnan(tsec)
+            if not keep.all():
+                if self.log: self.log.warning(f"{(~keep).sum()} rows have a missing date or time, not plotted")
+            indf = indf[keep]
+            track = indf[self.dfc["htrack"]] if self.dfc["htrack"] is not None else None
+            yield tsec[keep], indf[self.dfc["hlat"]].to_numpy(dtype=float), \
+                indf[self.dfc["hlon"]].to_numpy(dtype=float), track, vals[:len(keep)][keep]
+
+    def extents(self):
+        """
+        | First pass, the ranges of the data and the fix count and time range
+        | of every track.
+
+        Returns
+        -------
+        ext : dict
+        """
+        ext = {"tmin":np.inf, "tmax":-np.inf, "latmin":np.inf, "latmax":-np.inf, \
+            "lonmin":np.inf, "lonmax":-np.inf, "rows":0, "tracks":None}
+        tracks = []
+        for tsec, lat, lon, track, vals in self.chunks():
+            if len(tsec) == 0:
+                continue
+            ext["rows"] += len(tsec)
+            ext["tmin"] = min(ext["tmin"], tsec.min())
+            ext["tmax"] = max(ext["tmax"], tsec.max())
+            placed = np.isfinite(lat) & np.isfinite(lon)
+            if not placed.all():
+                if self.log: self.log.warning(f"{(~placed).sum()} rows have a missing position, left off the map")
+            if placed.any():
+                ext["latmin"] = min(ext["latmin"], lat[placed].min())
+                ext["latmax"] = max(ext["latmax"], lat[placed].max())
+                ext["lonmin"] = min(ext["lonmin"], lon[placed].min())
+                ext["lonmax"] = max(ext["lonmax"], lon[placed].max())
+            if track is not None:
+                tracks.append(pd.DataFrame({"track":track.to_numpy(), "tsec":tsec}) \
+                    .groupby("track")["tsec"].agg(["count", "min", "max"]))
+                # Keep the per-track table small between chunks
+                tracks = [pd.concat(tracks).groupby(level=0).agg({"count":"sum", "min":"min", "max":"max"})]
+        if tracks:
+            ext["tracks"] = tracks[0].sort_values("count", ascending=False).head(self.ntracks)
+        if self.log: self.log.info(f"Plotting {ext['rows']} rows")
+        return ext
+
+    def accumulate(self, ext):
+        """
+        | Second pass, reduce every chunk into the map, time series, and track
+        | bins.  Memory only depends on the number of bins.
+
+        Parameters
+        ----------
+        ext : dict
+            from extents
+
+        Returns
+        -------
+        acc : dict
+            sum, count, min, and max of each binned array
+        """
+        def empty(size):
+            return {"sum":np.zeros(size), "count":np.zeros(size), \
+                "min":np.full(size, np.inf), "max":np.full(size, -np.inf)}
+
+        def add(bins, idx, vals):
+            good = np.isfinite(vals)
+            idx = idx[good]
+            vals = vals[good]
+            bins["sum"] += np.bincount(idx, weights=vals, minlength=len(bins["sum"]))
+            bins["count"] += np.bincount(idx, minlength=len(bins["count"]))
+            np.minimum.at(bins["min"], idx, vals)
+            np.maximum.at(bins["max"], idx, vals)
+            return
+
+        def binof(vals, vmin, vmax, nbins):
+            span = vmax - vmin if vmax > vmin else 1
+            return np.clip(((vals - vmin) / span * nbins).astype(int), 0, nbins - 1)
+
+        acc = {"map":empty(self.mapbins * self.mapbins), "time":empty(self.timebins), "tracks":None}
+        tracks = ext["tracks"]
+        if tracks is not None:
+            acc["tracks"] = empty(len(tracks) * self.trackbins)
+            tpos = pd.Series(np.arange(len(tracks)), index=tracks.index)
+        for tsec, lat, lon, track, vals in self.chunks():
+            # Rows without a position stay in the time and track plots
+            placed = np.isfinite(lat) & np.isfinite(lon)
+            ilat = binof(lat[placed], ext["latmin"], ext["latmax"], self.mapbins)
+            ilon = binof(lon[placed], ext["lonmin"], ext["lonmax"], self.mapbins)
+            add(acc["map"], ilat * self.mapbins + ilon, vals[placed])
+            add(acc["time"], binof(tsec, ext["tmin"], ext["tmax"], self.timebins), vals)
+            if tracks is None:
+                continue
+            pos = track.map(tpos).to_numpy(dtype=float)
+            mine = np.isfinite(pos)
+            if not mine.any():
+                continue
+            pos = pos[mine].astype(int)
+            tmin = tracks["min"].to_numpy()[pos]
+            span = np.maximum(tracks["max"].to_numpy()[pos] - tmin, 1)
+            itime = np.clip(((tsec[mine] - tmin) / span * self.trackbins).astype(int), 0, self.trackbins - 1)
+            add(acc["tracks"], pos * self.trackbins + itime, vals[mine])
+        return acc
+
+    def reduce(self, bins, shape):
+        """
+        | Mean, min, and max of accumulated bins, NaN where empty.
+
+        Parameters
+        ----------
+        bins : dict
+            from accumulate
+        shape : tuple
+            output shape
+
+        Returns
+        -------
+        mean, vmin, vmax : numpy array
+        """
+        empty = bins["count"] == 0
+        with np.errstate(divide="ignore", invalid="ignore"):
+            mean = bins["sum"] / bins["count"]
+        vmin = np.where(empty, np.nan, bins["min"])
+        vmax = np.where(empty, np.nan, bins["max"])
+        mean[empty] = np.nan
+        return mean.reshape(shape), vmin.reshape(shape), vmax.reshape(shape)
+
+    def plot_map(self, acc, ext):
+        """
+        | Map of the mean of the column in lat/lon bins.
+        """
+        mean, _, _ = self.reduce(acc["map"], (self.mapbins, self.mapbins))
+        fig, ax = plt.subplots(figsize=(8, 6))
+        mesh = ax.pcolormesh(np.linspace(ext["lonmin"], ext["lonmax"], self.mapbins + 1), \
+            np.linspace(ext["latmin"], ext["latmax"], self.mapbins + 1), \
+            np.ma.masked_invalid(mean), shading="flat", rasterized=True)
+        fig.colorbar(mesh, ax=ax, label=f"mean {self.column}")
+        ax.set_xlabel("Longitude")
+        ax.set_ylabel("Latitude")
+        ax.set_title(f"{self.column}, {ext['rows']} rows")
+        self.save(fig, "map")
+        return
+
+    def plot_time(self, acc, ext):
+        """
+        | Season time series, the mean of each time bin with its min/max band.
+        """
+        mean, vmin, vmax = self.reduce(acc["time"], (self.timebins,))
+        edges = np.linspace(ext["tmin"], ext["tmax"], self.timebins + 1)
+        centers = pd.to_datetime((edges[:-1] + edges[1:]) / 2, unit='s')
+        fig, ax = plt.subplots(figsize=(12, 4))
+        ax.fill_between(centers, vmin, vmax, alpha=0.3, linewidth=0, rasterized=True, label="min/max")
+        ax.plot(centers, mean, linewidth=0.8, rasterized=True, label="mean")
+        ax.set_ylabel(self.column)
+        ax.legend(loc="upper right")
+        fig.autofmt_xdate()
+        self.save(fig, "timeseries")
+        return
+
+    def plot_tracks(self, acc, ext):
+        """
+        | One panel per track with the most fixes, binned over the track time.
+        """
+        tracks = ext["tracks"]
+        if tracks is None:
+            if self.log: self.log.info(f"No track header, skipping track plots")
+            return
+        mean, vmin, vmax = self.reduce(acc["tracks"], (len(tracks), self.trackbins))
+        ncols = min(3, len(tracks))
+        nrows = -(-len(tracks) // ncols)
+        fig, axes = plt.subplots(nrows, ncols, figsize=(4 * ncols, 2.5 * nrows), squeeze=False)
+        for ii, (name, row) in enumerate(tracks.iterrows()):
+            ax = axes.flat[ii]
+            hours = np.linspace(0, (row["max"] - row["min"]) / 3600, self.trackbins + 1)
+            hours = (hours[:-1] + hours[1:]) / 2
+            ax.fill_between(hours, vmin[ii], vmax[ii], alpha=0.3, linewidth=0, rasterized=True)
+            ax.plot(hours, mean[ii], linewidth=0.8, rasterized=True)
+            ax.set_title(f"{name} ({int(row['count'])} fixes)", fontsize=9)
+            ax.set_xlabel("hours from start", fontsize=8)
+        for ax in axes.flat[len(tracks):]:
+            ax.set_visible(False)
+        fig.tight_layout()
+        self.save(fig, "tracks")
+        return
+
+    def plot_dose(self):
+        """
+        | Histogram of the per-track dose, if SMARTS_dose.csv has the column.
+        """
+        dosecol = "dose_" + self.column
+        if not os.path.isfile(self.dosefile):
+            return
+        dose = pd.read_csv(self.dosefile)
+        if dosecol not in dose.columns:
+            if self.log: self.log.info(f"No {dosecol} in {self.dosefile}, skipping dose plot")
+            return
+        fig, ax = plt.subplots(figsize=(6, 4))
+        ax.hist(dose[dosecol].dropna(), bins=min(100, max(10, len(dose) // 10)), rasterized=True)
+        ax.set_xlabel(dosecol)
+        ax.set_ylabel("tracks")
+        self.save(fig, "dose")
+        return
+
+    def save(self, fig, name):
+        """
+        | Save a figure to the output directory and close it.
+        """
+        path = self.outdir + '/' + self.column + '_' + name + ".png"
+        fig.savefig(path, dpi=150)
+        plt.close(fig)
+        if self.log: self.log.info(f"Saved plot {path}")
+        return
+
+    def run(self):
+        """
+        | Make every plot.  Two streaming passes over the data, one for the
+        | extents and one for the bins.
+        """
+        if not self.get_heads():
+            return
+        os.makedirs(self.outdir, exist_ok=True)
+        ext = self.extents()
+        if ext["rows"] == 0:
+            if self.log: self.log.error(f"No rows to plot")
+            return
+        acc = self.accumulate(ext)
+        self.plot_map(acc, ext)
+        self.plot_time(acc, ext)
+        self.plot_tracks(acc, ext)
+        self.plot_dose()
+        return
@@ -18,12 +18,14 @@ __maintainer__ = "Wesley T. Honeycutt"
 __email__ = "honeycutt@ou.edu"
 __status__ = "alpha"
 
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
 from glob import glob
 import os
-import pandas as pd
 import shutil
 import subprocess
-import xarray as xr
+import time
+
+from src.solarpos import is_night, missing
 
 
 class procSMARTS:
@@ -35,6 +37,33 @@ class procSMARTS:
     log = None
     pwd = None
     outarray = None
+    # Deck index for each df row, negative entries are skipped rows
+    rowmap = None
+    # Profile index for each df row, and the (time, lat, lon) key per profile
+    profid = None
+    profiles = None
+    profile = False
+    profarray = None
+    # Optional Governor, runs SMARTS on concurrent workers when set
+    governor = None
+    # Extra per-row columns saved next to SMARTSirr
+    extra = None
+    # Shared CARD4 to CARD17 text, built once per set of cards
+    static = None
+    # Default values for the deck inputs which are educated guesses
+    CARDS = {\
+        "tday":25, \
+        "qco2":427, \
+        "tau550":0.2, \
+        "rhox":0.25, \
+    }
+    cards = None
+    # Keep the SMARTS output files in data/smarts_out
+    keep = True
+    # Keys which define a shared vertical profile
+    prof_keys = ["hyr", "hmon", "hday", "hhr", "hmin", "hsec", "hlat", "hlon"]
+    # Decimals used when matching altitude bins within a profile
+    prof_round = {"hgl":0, "hagl":0, "htmp":1, "hrh":1}
     # Storage for the name listed in the df header
     dfc = {\
         "hyr":None, \
@@ -68,13 +97,17 @@ class procSMARTS:
         "hrh":None, \
     }
 
-    def __init__(self, indf, runid, dfhd, pwd, log=None):
+    def __init__(self, indf, runid, dfhd, pwd, profile=False, governor=None, log=None):
         """
         | Initializes the SMARTS processor
 
         Parameters
         ----------
         indf : Pandas dataframe
+        profile : bool
+            Group rows sharing time and location into vertical profiles
+        governor : Governor
+            Optional governor for running SMARTS on concurrent workers
         """
         self.indf = indf
         self.runid = runid
@@ -92,6 +125,10 @@ class procSMARTS:
         self.dfc["htmp"] = dfhd["dft"]
         self.dfc["hrh"] = dfhd["dfrh"]
         self.pwd = pwd
+        self.profile = profile
+        self.governor = governor
+        self.cards = dict(self.CARDS)
+        self.static = {}
         self.log = log
         return
 
@@ -110,6 +147,156 @@ class procSMARTS:
             self.dfc[key] = list(matches)[0]
         return
 
+    def load_row(self, idx, row):
+        """
+        | Pull the values for one df row into dfv and normalize the season.
+
+        Parameters
+        ----------
+        idx : int
+            index of the row, used for logging
+        row : Pandas series
+            row of the input dataframe
+        """
+        # Cycle through headers in the dataframe,
+        for key in self.dfc:
+            self.dfv[key] = row[self.dfc[key]]
+        # Process season naming
+        if self.dfv["hseas"] == "fall":
+            #NOTE SMARTS recommends WINTER here, but fall migration tends to
+            #be during the June/July.  Summer makes more sense.
+            self.dfv["hseas"] = "\'SUMMER\'"
+        elif self.dfv["hseas"] == "spring":
+            self.dfv["hseas"] = "\'SUMMER\'"
+        else:
+            if self.log: self.log.error(f"Season mismatch in df row {idx}")
+        return
+
+    def deck_site(self, idx_zstr):
+        """
+        | Cards which change with every altitude bin (CARD1 to CARD3a).
+        | Requires load_row.
+
+        Parameters
+        ----------
+        idx_zstr : string
+            6-digit string with inp file_counter
+
+        Returns
+        -------
+        inp : string
+            partial content of the INP file
+        """
+        # Create artificial ground level
+        hgl = self.dfv["hasl"] - self.dfv["hagl"]
+        # Create datestring in YYYYMMdd format
+        date = str(self.dfv["hyr"]) + f"{self.dfv['hmon']:02d}" + f"{self.dfv['hday']:02d}"
+        # try:
+        #     import xarray as xr
+        #     ds = xr.open_dataset(PWD + 'aod/viirs_eps_npp_aod_0.250_deg_' + s_date + '_interpAOD550.nc', engine="netcdf4")
+        # except FileNotFoundError:
+        #     continue
+        # s_aod = ds['AOD550'].sel(lon=s_lon, lat=s_lat, method='nearest')
+        # s_aod = float(s_aod.values)
+        ## Create the SMARTS FORTRAN input file here.  Refer to the input
+        ## Documentation for CARD definitions
+        inp = ""
+        # CARD1 comnt
+        inp += "\'" + idx_zstr + "_allbirds\'\n"
+        # CARD2 ispr
+        inp += "2\n"
+        # CARD2a latit, altit, height
+        inp += str(self.dfv["hlat"]) + ' ' + str(hgl/1000) + ' ' + str(self.dfv["hagl"]/1000) + '\n'
+        # CARD3 iatmos
+        inp += "0\n"
+        # CARD3a tair, rh, season, tday
+        #FIXME using an average daily temperature of 25 for all data may be problematic
+        inp += str(self.dfv["htmp"]) + ' ' \
+            + str(self.dfv["hrh"]) + ' ' \
+            + str(self.dfv["hseas"]) + ' ' \
+            + str(self.cards["tday"]) + '\n'
+        return inp
+
+    def deck_static(self):
+        """
+        | Cards which are identical for every row (CARD4 to CARD17).  Built
+        | once for each set of cards and reused for the whole run.
+
+        Returns
+        -------
+        inp : string
+            partial content of the INP file
+        """
+        cardkey = tuple(self.cards.items())
+        if cardkey in self.static:
+            return self.static[cardkey]
+        inp = ""
+        # CARD4 ih2o TODO calc of precip above bird might help here
+        inp += "1\n"
+        # CARD5 io3
+        inp += "1\n"
+        # CARD6 igas
+        inp += "1\n"
+        # CARD7 qco2 TODO get date correlated world average
+        inp += str(self.cards["qco2"]) + '\n'
+        # CARD7a ispctr
+        inp += "1\n"
+        # CARD8 aeros TODO calc of rural/urban may improve model
+        inp += "\'S&F_RURAL\'\n"
+        # CARD9 iturb
+        inp += "5\n"
+         # CARD9a tau550 NOTE assume total column below 6km, see user manual TODO FIXME
+        # inp += str(s_aod) + '\n'
+        inp += str(self.cards["tau550"]) + '\n'
+        # CARD10 ialbdx TODO match to land type if this matters
+        inp += "-1\n"
+        # CARD10a rhox TODO using arbitrary broadband here, see above
+        inp += str(self.cards["rhox"]) + '\n'
+        # CARD10b itilt TODO possible from some flight data
+        inp += "0\n"
+        # CARD11 wlmn, wlmx, suncor, solarc
+        inp += "280 4000 1.024 1367.0\n"
+        # CARD12 iprt
+        inp += "2\n"
+        # CARD12a wpmn, wpmx, intvl
+        inp += "280 4000 .5\n"
+        # CARD12b iotot
+        inp += "6\n"
+        # CARD12c iout
+        inp += "2 7 8 9 10 30\n"
+        # CARD13 icirc
+        inp += "0\n"
+        # CARD14 iscan
+        inp += "1\n"
+        # CARD14a ifilt, wv1, wv2, step, fwhm
+        inp += "1 310 3970 2.5 30\n"
+        # CARD15 illum TODO is this relevant here like for plants?
+        inp += "0\n"
+        # CARD16 iuv TODO potentially relevant for UV absorption
+        inp += "0\n"
+        # CARD17 imass TODO better airmass might help here
+        inp += "3\n"
+        self.static[cardkey] = inp
+        return inp
+
+    def deck_time(self):
+        """
+        | Solar geometry card (CARD17a).  Requires load_row.
+
+        Returns
+        -------
+        inp : string
+            partial content of the INP file
+        """
+        # CARD17a
+        inp = str(self.dfv["hyr"]) + ' ' \
+            + str(self.dfv["hmon"]) + ' ' \
+            + str(self.dfv["hday"]) + ' ' \
+            + str(self.dfv["hhr"]) + ' ' \
+            + str(self.dfv["hlat"]) + ' ' \
+            + str(self.dfv["hlon"]) + ' 0'
+        return inp
+
     def create_inps(self):
         """
         | Create the SMARTS input files.  Requires status info.
@@ -118,103 +305,96 @@ class procSMARTS:
         ----------
         """
         self.get_heads()
+        if self.profile:
+            self.create_profile_inps()
+            return
+        self.rowmap = []
         # For each row in the input dataframe
         #TODO iterrows is inefficient, but I'm lazy and don't expect big df's.
         for idx, row in self.indf.iterrows():
             idx_zstr = f"{idx:06d}"
-            # Cycle through headers in the dataframe,
-            for key in self.dfc:
-                self.dfv[key] = row[self.dfc[key]]
-            # Process season naming
-            if self.dfv["hseas"] == "fall":
-                #NOTE SMARTS recommends WINTER here, but fall migration tends to
-                #be during the June/July.  Summer makes more sense.
-                self.dfv["hseas"] = "\'SUMMER\'"
-            elif self.dfv["hseas"] == "spring":
-                self.dfv["hseas"] = "\'SUMMER\'"
-            else:
-                if self.log: self.log.error(f"Season mismatch in df row {idx}")
-            # Create artificial ground level
-            hgl = self.dfv["hasl"] - self.dfv["hagl"]
-            # Create datestring in YYYYMMdd format
-            date = str(self.dfv["hyr"]) + f"{self.dfv["hmon"]:02d}" + f"{self.dfv["hday"]:02d}"
-            # try:
-            #     ds = xr.open_dataset(PWD + 'aod/viirs_eps_npp_aod_0.250_deg_' + s_date + '_interpAOD550.nc', engine="netcdf4")
-            # except FileNotFoundError:
-            #     continue
-            # s_aod = ds['AOD550'].sel(lon=s_lon, lat=s_lat, method='nearest')
-            # s_aod = float(s_aod.values)
-            ## Create the SMARTS FORTRAN input file here.  Refer to the input
-            ## Documentation for CARD definitions
-            inp = ""
-            # CARD1 comnt
-            inp += "\'" + idx_zstr + "_allbirds\'\n"
-            # CARD2 ispr
-            inp += "2\n"
-            # CARD2a latit, altit, height
-            inp += str(self.dfv["hlat"]) + ' ' + str(hgl/1000) + ' ' + str(self.dfv["hagl"]/1000) + '\n'
-            # CARD3 iatmos
-            inp += "0\n"
-            # CARD3a tair, rh, season, tday
-            #FIXME using an average daily temperature of 25 for all data may be problematic
-            inp += str(self.dfv["htmp"]) + ' ' \
-                + str(self.dfv["hrh"]) + ' ' \
-                + str(self.dfv["hseas"]) + ' ' \
-                + str(25) + '\n'
-            # CARD4 ih2o TODO calc of precip above bird might help here
-            inp += "1\n"
-            # CARD5 io3
-            inp += "1\n"
-            # CARD6 igas
-            inp += "1\n"
-            # CARD7 qco2 TODO get date correlated world average
-            inp += "427\n"
-            # CARD7a ispctr
-            inp += "1\n"
-            # CARD8 aeros TODO calc of rural/urban may improve model
-            inp += "\'S&F_RURAL\'\n"
-            # CARD9 iturb
-            inp += "5\n"
-             # CARD9a tau550 NOTE assume total column below 6km, see user manual TODO FIXME
-            # inp += str(s_aod) + '\n'
-            inp += str(0.2) + '\n'
-            # CARD10 ialbdx TODO match to land type if this matters
-            inp += "-1\n"
-            # CARD10a rhox TODO using arbitrary broadband here, see above
-            inp += "0.25\n"
-            # CARD10b itilt TODO possible from some flight data
-            inp += "0\n"
-            # CARD11 wlmn, wlmx, suncor, solarc
-            inp += "280 4000 1.024 1367.0\n"
-            # CARD12 iprt
-            inp += "2\n"
-            # CARD12a wpmn, wpmx, intvl
-            inp += "280 4000 .5\n"
-            # CARD12b iotot
-            inp += "6\n"
-            # CARD12c iout
-            inp += "2 7 8 9 10 30\n"
-            # CARD13 icirc
-            inp += "0\n"
-            # CARD14 iscan
-            inp += "1\n"
-            # CARD14a ifilt, wv1, wv2, step, fwhm
-            inp += "1 310 3970 2.5 30\n"
-            # CARD15 illum TODO is this relevant here like for plants?
-            inp += "0\n"
-            # CARD16 iuv TODO potentially relevant for UV absorption
-            inp += "0\n"
-            # CARD17 imass TODO better airmass might help here
-            inp += "3\n"
-            # CARD17a
-            inp += str(self.dfv["hyr"]) + ' ' \
-                + str(self.dfv["hmon"]) + ' ' \
-                + str(self.dfv["hday"]) + ' ' \
-                + str(self.dfv["hhr"]) + ' ' \
-                + str(self.dfv["hlat"]) + ' ' \
-                + str(self.dfv["hlon"]) + ' 0'
-
+            self.load_row(idx, row)
+            inp = self.deck_site(idx_zstr) + self.deck_static() + self.deck_time()
             self.write_inp(idx_zstr, inp)
+            self.rowmap.append(idx)
+        return
+
+    def profile_bin(self):
+        """
+        | Rounded per-bin inputs used to match decks inside a profile.
+        | Requires load_row.
+
+        Returns
+        -------
+        key : tuple
+            hashable key of the rounded bin inputs
+        """
+        hgl = self.dfv["hasl"] - self.dfv["hagl"]
+        key = (round(hgl, self.prof_round["hgl"]), \
+            round(self.dfv["hagl"], self.prof_round["hagl"]), \
+            round(self.dfv["htmp"], self.prof_round["htmp"]), \
+            round(self.dfv["hrh"], self.prof_round["hrh"]), \
+            self.dfv["hseas"], \
+        )
+        return key
+
+    def create_profile_inps(self):
+        """
+        | Create the SMARTS input files for vertical profiles.  Rows sharing
+        | the same time and location are grouped so the solar geometry is
+        | checked once per profile, nighttime profiles are skipped entirely,
+        | and altitude bins which round to the same inputs share one deck.
+        | Profiles missing a time or location are set to -1 without a deck.
+
+        Parameters
+        ----------
+        """
+        nrows = len(self.indf)
+        self.rowmap = [-1] * nrows
+        self.profid = [-1] * nrows
+        self.profiles = []
+        counter = 0
+        nskip = 0
+        nmiss = 0
+        # Keep rows with a missing key, they form their own profile
+        grouped = self.indf.groupby([self.dfc[key] for key in self.prof_keys], sort=False, dropna=False)
+        for gid, (gkey, positions) in enumerate(grouped.indices.items()):
+            self.profiles.append(gkey)
+            for pos in positions:
+                self.profid[pos] = gid
+            # A missing time or location can't be placed, fail the profile
+            if missing(*gkey):
+                if self.log: self.log.warning(f"Profile {gid} has a missing time or location, setting {len(positions)} bins to -1")
+                for pos in positions:
+                    self.rowmap[pos] = -1
+                nmiss += len(positions)
+                continue
+            # Shared geometry, from the first bin of the profile
+            self.load_row(self.indf.index[positions[0]], self.indf.iloc[positions[0]])
+            if is_night(self.dfv["hyr"], self.dfv["hmon"], self.dfv["hday"], \
+                self.dfv["hhr"], self.dfv["hlat"], self.dfv["hlon"]):
+                if self.log: self.log.info(f"Profile {gid} is nighttime, skipping {len(positions)} bins")
+                for pos in positions:
+                    self.rowmap[pos] = -2
+                nskip += len(positions)
+                continue
+            time_card = self.deck_time()
+            cache = {}
+            for pos in positions:
+                idx = self.indf.index[pos]
+                self.load_row(idx, self.indf.iloc[pos])
+                key = self.profile_bin()
+                if key in cache:
+                    self.rowmap[pos] = cache[key]
+                    if self.log: self.log.debug(f"Row {idx} reuses deck {cache[key]:06d}")
+                    continue
+                idx_zstr = f"{counter:06d}"
+                inp = self.deck_site(idx_zstr) + self.deck_static() + time_card
+                self.write_inp(idx_zstr, inp)
+                cache[key] = counter
+                self.rowmap[pos] = counter
+                counter += 1
+        if self.log: self.log.info(f"{len(self.profiles)} profiles, {counter} decks for {nrows} rows, {nskip} nighttime bins skipped, {nmiss} bins missing a time or location")
         return
 
     def write_inp(self, idx_zstr, inp):
@@ -256,11 +436,164 @@ class procSMARTS:
                 raise RuntimeError(f"readable_file:{path} is not a valid to a file")
         return os.path.abspath(path)
 
+    def run_one(self, inp, workdir):
+        """
+        | Run SMARTS for one inp file inside a working directory and parse the
+        | result.  The output files are moved into data/smarts_out, or deleted
+        | when keep is False.
+
+        Parameters
+        ----------
+        inp : string
+            path to the inp file
+        workdir : string
+            directory holding the SMARTS data files, which SMARTS runs in
+
+        Returns
+        -------
+        irr : string or int
+            integrated irradiance, or a negative code on failure
+        """
+        #TODO this is linux-only currently
+        fileid = inp.split('/')[-1].split(".inp.txt")[0]
+        try:
+            self.file_path(inp)
+        except RuntimeError:
+            return -1
+        shutil.copyfile(inp, workdir + "/smarts295.inp.txt")
+
+        #TODO this is linux-only right now.
+        subprocess.run(self.pwd + "/SMARTS/smarts295bat", cwd=workdir)
+        irr = None
+        with open(workdir + "/smarts295.out.txt", 'r', encoding="ISO-8859-1") as outfile:
+            zenith = False
+            turbid = False
+            for row in outfile:
+                if "Terrestrial = " in row:
+                    irr = row.split('=')[2].replace(' ', '').split('A')[0]
+                    if self.log: self.log.info(f"Calculated IRR={irr} successfully.")
+                elif "> 90 deg. RUN ABORTED!" in row:
+                    zenith = True
+                    if self.log: self.log.info(f"Zenith angle low, nighttime.  Setting to -2")
+                elif "turbidity is too large" in row:
+                    turbid = True
+                    if self.log: self.log.info(f"Turbidity problem in file, setting to -3")
+        if irr is None:
+            if zenith == True:
+                irr = -2
+            elif turbid == True:
+                irr = -3
+            else:
+                irr = -4
+        # Move these files into our output storage space
+        for ext in ["out", "ext", "scn"]:
+            try:
+                if self.keep:
+                    shutil.move(workdir + "/smarts295." + ext + ".txt", \
+                    self.pwd + "/data/smarts_out/" + fileid + '.' + ext + ".txt")
+                else:
+                    os.remove(workdir + "/smarts295." + ext + ".txt")
+            except FileNotFoundError:
+                pass
+        return irr
+
+    def make_workdir(self, num):
+        """
+        | Create a private SMARTS working directory for a concurrent worker.
+        | SMARTS always uses the same file names, so each worker needs its own
+        | directory.  The SMARTS data files are symlinked, not copied.
+
+        Parameters
+        ----------
+        num : int
+            worker number
+
+        Returns
+        -------
+        workdir : string
+            path to the working directory
+        """
+        workdir = self.pwd + "/SMARTS/worker_" + f"{num:03d}"
+        os.makedirs(workdir, exist_ok=True)
+        for entry in os.listdir(self.pwd + "/SMARTS"):
+            if entry.startswith("smarts295.") or entry.startswith("worker_") \
+                or entry == ".gitignore":
+                continue
+            link = workdir + '/' + entry
+            if not os.path.lexists(link):
+                os.symlink(self.pwd + "/SMARTS/" + entry, link)
+        return workdir
+
+    def run_governed(self, inplist):
+        """
+        | Run the inp files on concurrent workers, asking the governor how many
+        | workers to keep busy.  No new runs start while it is paused.
+
+        Parameters
+        ----------
+        inplist : list
+            sorted list of inp files
+        """
+        results = [-1] * len(inplist)
+        workdirs = [self.make_workdir(num) for num in range(self.governor.maxworkers)]
+        idle = workdirs[::-1]
+        pending = {}
+        nxt = 0
+        try:
+            with ThreadPoolExecutor(max_workers=len(workdirs)) as pool:
+                while nxt < len(inplist) or pending:
+                    target = self.governor.update()
+                    while nxt < len(inplist) and len(pending) < target:
+                        workdir = idle.pop()
+                        pending[pool.submit(self.run_one, inplist[nxt], workdir)] = (nxt, workdir)
+                        nxt += 1
+                    if not pending:
+                        # Paused with nothing running
+                        time.sleep(self.governor.interval)
+                        continue
+                    done, _ = wait(pending, timeout=self.governor.interval, return_when=FIRST_COMPLETED)
+                    for future in done:
+                        idx, workdir = pending.pop(future)
+                        idle.append(workdir)
+                        results[idx] = future.result()
+        finally:
+            self.outarray = results
+            for workdir in workdirs:
+                shutil.rmtree(workdir, ignore_errors=True)
+        return
+
+    def run_decks(self, inplist):
+        """
+        | Run a list of inp files, serially or through the governor, and
+        | store one result per file in outarray.
+
+        Parameters
+        ----------
+        inplist : list
+            inp files to run
+        """
+        # Clear out any old files
+        for ext in ["out", "ext", "scn"]:
+            try:
+                os.remove(self.pwd + "/SMARTS/smarts295." + ext + ".txt")
+            except FileNotFoundError:
+                pass
+
+        self.outarray = []
+        if self.governor is not None:
+            self.run_governed(inplist)
+        else:
+            # Cycle through input files
+            for inp in inplist:
+                self.outarray.append(self.run_one(inp, self.pwd + "/SMARTS"))
+        return self.outarray
+
     def run_smarts(self):
         """
         | This runs the SMARTS batch script. This has some quirks as a legacy
         | program. Files will have to be switched back and forth while the
-        | working directory is held constant.
+        | working directory is held constant.  With a governor, runs are
+        | spread over concurrent workers, each in its own directory.
 
         Parameters
         ----------
@@ -270,85 +603,115 @@ class procSMARTS:
         inplist.sort()
         if self.log: self.log.debug(f"all inp files: {inplist}")
 
-        # Clear out any old files
-        try:
-            os.remove(self.pwd + "/SMARTS/smarts295.out.txt")
-        except FileNotFoundError:
-            pass
-        try:
-            os.remove(self.pwd + "/SMARTS/smarts295.ext.txt")
-        except FileNotFoundError:
-            pass
-        try:
-            os.remove(self.pwd + "/SMARTS/smarts295.scn.txt")
-        except FileNotFoundError:
-            pass
-
         self.outarray = []
-
-        # Change working directory to SMARTS
-        os.chdir(self.pwd + "/SMARTS/")
         try:
-            # Cycle through input files
-            for inp in inplist:
-                #TODO this is linux-only currently
-                fileid = inp.split('/')[-1].split(".inp.txt")[0]
-                try:
-                    self.file_path(inp)
-                except RuntimeError:
-                    self.outarray.append(-1)
-                    continue
-                shutil.copyfile(inp, self.pwd + "/SMARTS/smarts295.inp.txt")
-
-                #TODO this is linux-only right now.
-                subprocess.run(self.pwd + "/SMARTS/smarts295bat")
-                with open(self.pwd + "/SMARTS/smarts295.out.txt", 'r', encoding="ISO-8859-1") as outfile:
-                    found = False
-                    zenith = False
-                    turbid = False
-                    for row in outfile:
-                        if "Terrestrial = " in row:
-                            irr = row.split('=')[2].replace(' ', '').split('A')[0]
-                            self.outarray.append(irr)
-                            if self.log: self.log.info(f"Calculated IRR={irr} successfully.")
-                            found = True
-                        elif "> 90 deg. RUN ABORTED!" in row:
-                            zenith = True
-                            if self.log: self.log.info(f"Zenith angle low, nighttime.  Setting to -2")
-                        elif "turbidity is too large" in row:
-                            turbid = True
-                            if self.log: self.log.info(f"Turbidity problem in file, setting to -3")
-                    if found == False:
-                        if zenith == True:
-                            self.outarray.append(-2)
-                        elif turbid == True:
-                            self.outarray.append(-3)
-                        else:
-                            self.outarray.append(-4)
-                    # Move these files into our output storage space
-                    try:
-                        shutil.move(self.pwd + "/SMARTS/smarts295.out.txt", \
-                        self.pwd + "/data/smarts_out/" + fileid + ".out.txt")
-                    except FileNotFoundError:
-                        pass
-                    try:
-                        shutil.move(self.pwd + "/SMARTS/smarts295.ext.txt", \
-                        self.pwd + "/data/smarts_out/" + fileid + ".ext.txt")
-                    except FileNotFoundError:
-                        pass
-                    try:
-                        shutil.move(self.pwd + "/SMARTS/smarts295.scn.txt", \
-                        self.pwd + "/data/smarts_out/" + fileid + ".scn.txt")
-                    except FileNotFoundError:
-                        pass
+            self.run_decks(inplist)
         finally:
-            # Return to original working directory
-            os.chdir(self.pwd)
             if self.log: self.log.info(f"Done with SMARTS loop")
+            if self.rowmap is not None:
+                self.fan_out(inplist)
             if self.log: self.log.debug(f"Output array: {self.outarray}")
-            with open(self.pwd + "/SMARTS_irr.csv", 'w') as outfile:
-                outfile.write("SMARTSirr\n")
-                for entry in self.outarray:
-                    outfile.write(str(entry))
-                    outfile.write('\n')
-            if self.log: self.log.info(f"Saved as {self.pwd + "SMARTS_irr.csv"}")
+            self.save_output()
+
+    def fan_out(self, inplist):
+        """
+        | Map the per-deck results from run_smarts back onto the df rows using
+        | rowmap.  Rows which were skipped keep their negative code, and decks
+        | which never produced a result are set to -1.
+
+        Parameters
+        ----------
+        inplist : list
+            sorted list of inp files which produced outarray
+        """
+        decks = [int(inp.split('/')[-1].split(".inp.txt")[0].split('_')[-1]) for inp in inplist]
+        results = dict(zip(decks, self.outarray))
+        self.outarray = [results.get(deck, -1) if deck >= 0 else deck for deck in self.rowmap]
+        return
+
+    def row_fileids(self):
+        """
+        | Name of the SMARTS run behind each df row.  Requires create_inps.
+
+        Returns
+        -------
+        fileids : list
+            RUNID_XXXXXX string for each row, or None for skipped rows
+        """
+        return [self.runid + '_' + f"{deck:06d}" if deck >= 0 else None for deck in self.rowmap]
+
+    def output_frame(self):
+        """
+        | Per-row output as a dataframe, SMARTSirr followed by any extra columns
+
+        Returns
+        -------
+        outdf : Pandas dataframe
+        """
+        # Only the post-processing stages need pandas
+        import pandas as pd
+
+        outdf = pd.DataFrame({"SMARTSirr": self.outarray})
+        if self.extra is not None:
+            outdf = pd.concat([outdf, self.extra.reset_index(drop=True)], axis=1)
+        return outdf
+
+    def save_output(self):
+        """
+        | Write the per-row irradiance to SMARTS_irr.csv, along with any extra
+        | columns from post-processing
+        """
+        with open(self.pwd + "/SMARTS_irr.csv", 'w') as outfile:
+            outfile.write("SMARTSirr")
+            if self.extra is not None:
+                outfile.write(',' + ','.join(self.extra.columns))
+                extrarows = self.extra.itertuples(index=False)
+            outfile.write('\n')
+            for entry in self.outarray:
+                outfile.write(str(entry))
+                if self.extra is not None:
+                    outfile.write(',' + ','.join([f"{val:.6g}" for val in next(extrarows)]))
+                outfile.write('\n')
+        if self.log: self.log.info(f"Saved as {self.pwd}/SMARTS_irr.csv")
+        return
+
+    def save_profiles(self):
+        """
+        | Collect the per-row results of a profile run into a (profiles x bins)
+        | array, padded with NaN, and write it to SMARTS_profile.csv with one
+        | line per profile.  Requires run_smarts with profile mode.
+
+        Returns
+        -------
+        profarray : numpy array
+            irradiance for each altitude bin of each profile, in input order
+        """
+        import numpy as np
+
+        if self.profiles is None:
+            if self.log: self.log.error(f"No profiles to save, was profile mode used?")
+            return None
+        nbins = [0] * len(self.profiles)
+        nskip = 0
+        for gid in self.profid:
+            if gid < 0:
+                nskip += 1
+                continue
+            nbins[gid] += 1
+        if nskip:
+            if self.log: self.log.warning(f"{nskip} rows are not in a profile, leaving them out of SMARTS_profile.csv")
+        self.profarray = np.full((len(self.profiles), max(nbins, default=0)), np.nan)
+        filled = [0] * len(self.profiles)
+        for gid, entry in zip(self.profid, self.outarray):
+            if gid < 0:
+                continue
+            self.profarray[gid, filled[gid]] = float(entry)
+            filled[gid] += 1
+        with open(self.pwd + "/SMARTS_profile.csv", 'w') as outfile:
+            outfile.write(','.join([self.dfc[key] for key in self.prof_keys]) + ",nbins,")
+            outfile.write(','.join([f"bin{i:03d}" for i in range(self.profarray.shape[1])]) + '\n')
+            for gid, gkey in enumerate(self.profiles):
+                outfile.write(','.join([str(val) for val in gkey]) + ',' + str(nbins[gid]) + ',')
+                outfile.write(','.join([str(val) for val in self.profarray[gid]]) + '\n')
+        if self.log: self.log.info(f"Saved profiles as {self.pwd}/SMARTS_profile.csv")
+        return self.profarray
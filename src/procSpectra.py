@@ -0,0 +1,319 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+Spectral post-processing of the SMARTS output
+"""
+
+# Backwards Comaptibility
+from __future__ import print_function
+
+# dunders
+__author__ = "Wesley T. Honeycutt"
+__copyright__ = "Copyright 2025"
+__credits__ = ["Wesley T. Honeycutt"]
+__license__ = "GPL-3.0"
+__version__ = "0.1.0"
+__maintainer__ = "Wesley T. Honeycutt"
+__email__ = "honeycutt@ou.edu"
+__status__ = "alpha"
+
+import numpy as np
+import os
+import pandas as pd
+
+
+def weight_photon(wl):
+    """
+    | Convert spectral irradiance in W/m2/nm to photon flux in umol/m2/s/nm.
+
+    Parameters
+    ----------
+    wl : numpy array
+        wavelengths in nm
+
+    Returns
+    -------
+    weight : numpy array
+    """
+    # lambda / (h * c * N_A), with the unit changes for nm and umol
+    return wl / 119.626566
+
+def weight_erythema(wl):
+    """
+    | CIE erythemal action spectrum (McKinlay-Diffey, ISO 17166).
+
+    Parameters
+    ----------
+    wl : numpy array
+        wavelengths in nm
+
+    Returns
+    -------
+    weight : numpy array
+    """
+    weight = np.zeros_like(wl, dtype=float)
+    weight[wl <= 298] = 1.0
+    mid = (wl > 298) & (wl <= 328)
+    weight[mid] = 10 ** (0.094 * (298 - wl[mid]))
+    high = (wl > 328) & (wl <= 400)
+    weight[high] = 10 ** (0.015 * (140 - wl[high]))
+    return weight
+
+
+class procSpectra:
+    """
+    Integrate the saved SMARTS spectra over wavelength bands
+    """
+    pwd = None
+    log = None
+    column = None
+    chunksize = 1000
+    # Reference wavelength grid, taken from the first spectrum read
+    wl = None
+    # Built-in weighting functions, name: callable(wl)
+    WEIGHTS = {\
+        "photon": weight_photon, \
+        "erythema": weight_erythema, \
+    }
+    # Built-in bands, name: (wlmin, wlmax, weighting)
+    BANDS = {\
+        "UVB": (280, 315, None), \
+        "UVA": (315, 400, None), \
+        "PAR": (400, 700, None), \
+        "PPFD": (400, 700, "photon"), \
+        "UVERY": (280, 400, "erythema"), \
+    }
+
+    def __init__(self, pwd, bands=None, column=None, chunksize=1000, log=None):
+        """
+        | Initializes the spectral post-processor
+
+        Parameters
+        ----------
+        pwd : string
+            working directory holding data/smarts_out
+        bands : string or list
+            bands to integrate, see parse_bands
+        column : string
+            header of the spectral column in the .ext.txt files.  Defaults to
+            the first "Global" column.
+        chunksize : int
+            number of spectra loaded into memory at once
+        log : Logging Object
+            Logging object to print messages to a logfile
+        """
+        self.pwd = pwd
+        self.column = column
+        self.chunksize = chunksize
+        self.log = log
+        self.bands = {}
+        if bands is not None:
+            self.parse_bands(bands)
+        return
+
+    def add_band(self, name, wlmin, wlmax, weight=None):
+        """
+        | Add a band to integrate.
+
+        Parameters
+        ----------
+        name : string
+            name of the output column
+        wlmin, wlmax : float
+            band limits in nm, inclusive
+        weight : None, string, or callable
+            None for a flat band, the name of a built-in weighting function,
+            a path to a two column csv of wavelength and weight, or a callable
+            taking a wavelength array
+        """
+        if wlmin >= wlmax:
+            raise ValueError(f"Band {name} has wlmin >= wlmax")
+        if isinstance(weight, str):
+            if weight in self.WEIGHTS:
+                weight = self.WEIGHTS[weight]
+            elif os.path.isfile(weight):
+                weight = self.read_weight(weight)
+            else:
+                raise ValueError(f"Band {name} weighting {weight} is not built-in or a file")
+        self.bands[name] = (float(wlmin), float(wlmax), weight)
+        if self.log: self.log.debug(f"Added band {name} {wlmin}-{wlmax} nm")
+        return
+
+    def parse_bands(self, spec):
+        """
+        | Parse bands from the command line.  Entries are separated by commas
+        | and are either a built-in band name (UVB, UVA, PAR, PPFD, UVERY) or
+        | name:wlmin:wlmax[:weight].
+
+        Parameters
+        ----------
+        spec : string or list
+            band specification
+        """
+        if isinstance(spec, str):
+            spec = spec.split(',')
+        for entry in spec:
+            entry = entry.strip()
+            if not entry:
+                continue
+            parts = entry.split(':')
+            if len(parts) == 1:
+                if parts[0].upper() not in self.BANDS:
+                    raise ValueError(f"Unknown band {parts[0]}, options: {list(self.BANDS)}")
+                self.add_band(parts[0].upper(), *self.BANDS[parts[0].upper()])
+            elif len(parts) in [3, 4]:
+                weight = parts[3] if len(parts) == 4 else None
+                self.add_band(parts[0], float(parts[1]), float(parts[2]), weight)
+            else:
+                raise ValueError(f"Band {entry} must be NAME or NAME:WLMIN:WLMAX[:WEIGHT]")
+        return
+
+    def read_weight(self, path):
+        """
+        | Load a weighting function from a csv of wavelength and weight.  The
+        | weight is linearly interpolated and is zero outside the table.
+
+        Parameters
+        ----------
+        path : string
+            path to the csv
+
+        Returns
+        -------
+        weight : callable
+        """
+        table = np.loadtxt(path, delimiter=',', comments='#', ndmin=2)
+        order = np.argsort(table[:, 0])
+        twl = table[order, 0]
+        tval = table[order, 1]
+        return lambda wl: np.interp(wl, twl, tval, left=0.0, right=0.0)
+
+    def read_spectrum(self, fileid):
+        """
+        | Read one .ext.txt file from data/smarts_out.
+
+        Parameters
+        ----------
+        fileid : string
+            RUNID_XXXXXX name of the SMARTS run
+
+        Returns
+        -------
+        wl : numpy array
+            wavelengths in nm, or None if the file is missing
+        values : numpy array
+            spectral irradiance from the selected column
+        """
+        path = self.pwd + "/data/smarts_out/" + fileid + ".ext.txt"
+        try:
+            spec = pd.read_csv(path, sep=r"\s+", encoding="ISO-8859-1")
+        except FileNotFoundError:
+            if self.log: self.log.debug(f"No spectrum for {fileid}")
+            return None, None
+        if self.column is None:
+            glob_cols = [col for col in spec.columns[1:] if "Global" in col]
+            self.column = glob_cols[0] if glob_cols else spec.columns[1]
+            if self.log: self.log.info(f"Using spectral column {self.column}")
+        return spec.iloc[:, 0].to_numpy(dtype=float), spec[self.column].to_numpy(dtype=float)
+
+    def weights(self):
+        """
+        | Build the (wavelengths x bands) matrix combining trapezoidal
+        | integration weights and the weighting function of each band, so a
+        | chunk of spectra integrates with one matrix product.
+
+        Returns
+        -------
+        wmat : numpy array
+        """
+        wmat = np.zeros((len(self.wl), len(self.bands)))
+        for ii, (wlmin, wlmax, weight) in enumerate(self.bands.values()):
+            inband = np.flatnonzero((self.wl >= wlmin) & (self.wl <= wlmax))
+            if len(inband) < 2:
+                if self.log: self.log.warning(f"Band {list(self.bands)[ii]} has fewer than 2 wavelengths")
+                continue
+            dx = np.diff(self.wl[inband]) / 2
+            wmat[inband[:-1], ii] += dx
+            wmat[inband[1:], ii] += dx
+            if weight is not None:
+                wmat[inband, ii] *= weight(self.wl[inband])
+        return wmat
+
+    def load_chunk(self, fileids):
+        """
+        | Load the spectra of a chunk into a (spectra x wavelengths) array.
+        | Each fileid is parsed once, even when many rows share it like in
+        | profile mode.  Spectra on another grid are interpolated onto the
+        | reference grid.
+
+        Parameters
+        ----------
+        fileids : list
+            fileid strings, or None for rows without a SMARTS run
+
+        Returns
+        -------
+        chunk : numpy array
+            one row per unique spectrum found, None if none were found
+        rowidx : numpy array
+            row of chunk for each fileid, -1 where there is no spectrum
+        """
+        unique = {}
+        spectra = []
+        rowidx = np.full(len(fileids), -1)
+        for ii, fileid in enumerate(fileids):
+            if fileid is None:
+                continue
+            if fileid not in unique:
+                wl, values = self.read_spectrum(fileid)
+                if wl is None:
+                    unique[fileid] = -1
+                    continue
+                if self.wl is None:
+                    self.wl = wl
+                if len(wl) != len(self.wl) or not np.array_equal(wl, self.wl):
+                    if self.log: self.log.warning(f"Spectrum {fileid} is on a different grid, interpolating")
+                    values = np.interp(self.wl, wl, values)
+                unique[fileid] = len(spectra)
+                spectra.append(values)
+            rowidx[ii] = unique[fileid]
+        if not spectra:
+            return None, rowidx
+        return np.vstack(spectra), rowidx
+
+    def integrate(self, fileids, codes=None):
+        """
+        | Integrate all bands for each row, streaming the spectra in chunks.
+
+        Parameters
+        ----------
+        fileids : list
+            fileid for each row, or None for rows without a SMARTS run
+        codes : list
+            SMARTSirr output for each row.  Rows with a negative code get the
+            same code in every band column.
+
+        Returns
+        -------
+        outdf : Pandas dataframe
+            one column per band, one row per entry of fileids
+        """
+        out = np.full((len(fileids), len(self.bands)), np.nan)
+        wmat = None
+        for start in range(0, len(fileids), self.chunksize):
+            chunk, rowidx = self.load_chunk(fileids[start:start + self.chunksize])
+            if chunk is None:
+                continue
+            if wmat is None:
+                wmat = self.weights()
+            # Integrate each unique spectrum once, then fan out to the rows
+            found = np.flatnonzero(rowidx >= 0)
+            out[start + found] = (chunk @ wmat)[rowidx[found]]
+            if self.log: self.log.debug(f"Integrated {len(chunk)} spectra for rows {start} to {start + len(rowidx)}")
+        if codes is not None:
+            codes = pd.to_numeric(pd.Series(codes), errors="coerce").to_numpy()
+            bad = codes < 0
+            out[bad] = codes[bad, None]
+        if self.log: self.log.info(f"Integrated {len(self.bands)} bands over {len(fileids)} rows")
+        return pd.DataFrame(out, columns=list(self.bands))
@@ -0,0 +1,134 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+Lightweight solar position for scheduling SMARTS runs
+"""
+
+# Backwards Comaptibility
+from __future__ import print_function
+
+# dunders
+__author__ = "Wesley T. Honeycutt"
+__copyright__ = "Copyright 2025"
+__credits__ = ["Wesley T. Honeycutt"]
+__license__ = "GPL-3.0"
+__version__ = "0.1.0"
+__maintainer__ = "Wesley T. Honeycutt"
+__email__ = "honeycutt@ou.edu"
+__status__ = "alpha"
+
+import math
+
+# SMARTS aborts a run when the zenith angle is beyond this
+ZENITH_MAX = 90.0
+# Safety margin in degrees, the approximation below is good to ~0.1 deg
+ZENITH_MARGIN = 1.0
+
+
+def missing(*vals):
+    """
+    | Check for blank or non-finite inputs, which can't be placed in time or
+    | space.
+
+    Parameters
+    ----------
+    vals :
+        values to check
+
+    Returns
+    -------
+    missing : bool
+        True if any value is None, blank, or not a finite number
+    """
+    for val in vals:
+        try:
+            if not math.isfinite(float(val)):
+                return True
+        except (TypeError, ValueError):
+            return True
+    return False
+
+def day_of_year(year, month, day):
+    """
+    | Ordinal day of the year, 1 for January 1st.
+
+    Parameters
+    ----------
+    year : int
+    month : int
+    day : int
+
+    Returns
+    -------
+    doy : int
+    """
+    cumdays = [0, 31, 59, 90, 120, 151, 181, 212, 243, 273, 304, 334]
+    doy = cumdays[int(month) - 1] + int(day)
+    leap = (year % 4 == 0 and year % 100 != 0) or year % 400 == 0
+    if leap and month > 2:
+        doy += 1
+    return doy
+
+def zenith(year, month, day, hour, lat, lon, zone=0):
+    """
+    | Solar zenith angle using the NOAA fractional year approximation.  The
+    | inputs follow SMARTS CARD17a for imass=3 (hour in local standard time,
+    | longitude positive east, zone in hours from UTC).  This is only meant to
+    | predict whether SMARTS will abort, not to replace its geometry.
+
+    Parameters
+    ----------
+    year, month, day : int
+        Date of the observation
+    hour : float
+        Decimal hour of the observation
+    lat : float
+        Latitude in degrees, positive north
+    lon : float
+        Longitude in degrees, positive east
+    zone : float
+        Timezone offset in hours.  Defaults to 0 (UTC).
+
+    Returns
+    -------
+    zen : float
+        Solar zenith angle in degrees
+    """
+    doy = day_of_year(int(year), int(month), int(day))
+    gamma = 2 * math.pi / 365 * (doy - 1 + (hour - 12) / 24)
+    eqtime = 229.18 * (0.000075 + 0.001868 * math.cos(gamma) \
+        - 0.032077 * math.sin(gamma) - 0.014615 * math.cos(2 * gamma) \
+        - 0.040849 * math.sin(2 * gamma))
+    decl = 0.006918 - 0.399912 * math.cos(gamma) + 0.070257 * math.sin(gamma) \
+        - 0.006758 * math.cos(2 * gamma) + 0.000907 * math.sin(2 * gamma) \
+        - 0.002697 * math.cos(3 * gamma) + 0.00148 * math.sin(3 * gamma)
+    # True solar time in minutes, then hour angle
+    tst = hour * 60 + eqtime + 4 * lon - 60 * zone
+    hang = math.radians(tst / 4 - 180)
+    rlat = math.radians(lat)
+    cosz = math.sin(rlat) * math.sin(decl) \
+        + math.cos(rlat) * math.cos(decl) * math.cos(hang)
+    cosz = min(1.0, max(-1.0, cosz))
+    return math.degrees(math.acos(cosz))
+
+def is_night(year, month, day, hour, lat, lon, zone=0, margin=ZENITH_MARGIN):
+    """
+    | Predict whether SMARTS will abort for a low sun.  Only returns True when
+    | the zenith angle clears ZENITH_MAX by the margin, so borderline cases are
+    | still sent to SMARTS.  Rows with missing inputs are never night.
+
+    Parameters
+    ----------
+    year, month, day, hour, lat, lon, zone :
+        See zenith()
+    margin : float
+        Degrees past ZENITH_MAX required to call it night
+
+    Returns
+    -------
+    night : bool
+    """
+    if missing(year, month, day, hour, lat, lon, zone):
+        return False
+    return zenith(year, month, day, hour, lat, lon, zone) > ZENITH_MAX + margin